@@ -1,6 +1,11 @@
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            TrigramSimilarity)
+from django.db import connections
+from django.db.models import Case, F, IntegerField, Q, Value, When
 from django_filters.rest_framework import FilterSet, filters
 
-from recipes.models import Ingredient, Recipe, Tag
+from foodgram import constants as c
+from recipes.models import Ingredient, Recipe, Tag, get_tags_mask
 
 
 class IngredientFilter(FilterSet):
@@ -18,15 +23,28 @@ class RecipeFilter(FilterSet):
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='filter_tags',
         label='Tags'
     )
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    search = filters.CharFilter(method='filter_search', label='Search')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'tags', 'author', 'is_favorited', 'is_in_shopping_cart', 'search'
+        )
+
+    def filter_tags(self, queryset, name, value):
+        if not value:
+            return queryset
+        if any(tag.bit is None for tag in value):
+            return queryset.filter(tags__in=value).distinct()
+        return queryset.alias(
+            tags_match=F('tags_mask').bitand(get_tags_mask(value))
+        ).filter(tags_match__gt=0)
 
     def filter_is_favorited(self, queryset, name, value):
         user = (
@@ -47,3 +65,28 @@ class RecipeFilter(FilterSet):
         if value and user:
             return queryset.filter(shopping_list__user_id=user.id)
         return queryset
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        if connections[queryset.db].vendor != 'postgresql':
+            return queryset.filter(
+                Q(name__icontains=value) | Q(text__icontains=value)
+            ).annotate(
+                rank=Case(
+                    When(name__istartswith=value, then=Value(2)),
+                    When(name__icontains=value, then=Value(1)),
+                    default=Value(0),
+                    output_field=IntegerField(),
+                )
+            ).order_by('-rank', '-id')
+        query = SearchQuery(
+            value, config=c.SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(
+            Q(search_vector=query) | Q(name__trigram_similar=value)
+        ).annotate(
+            rank=SearchRank(F('search_vector'), query),
+            similarity=TrigramSimilarity('name', value),
+        ).order_by('-rank', '-similarity', '-id')
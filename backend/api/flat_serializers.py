@@ -0,0 +1,192 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from api.serializers import get_followed_author_ids
+from foodgram import constants as c
+from foodgram.images import recorded_field_name, variant_urls
+from recipes.models import Recipe, RecipeIngredient, RecipeTags
+from users.models import User
+
+FRAGMENT_KEY = 'recipe_fragment:{}:{}:{}'
+
+
+class FlatRecipeSerializer:
+    """Read-only fast path producing ``RecipeReadSerializer`` output.
+
+    The page query only reads ids, modification times and the viewer's
+    flags. The rest of each recipe is a viewer independent fragment kept
+    in the cache under the recipe id and ``updated_at``, which moves on
+    every change of the recipe, its tags, ingredients, author or counters.
+    Missing fragments are built from ``.values()`` rows and one flat query
+    for tags and ingredients each, without model instances or serializer
+    fields. ``api.tests`` checks that the rendered output is identical to
+    the DRF serializer.
+    """
+
+    fields = (
+        'id',
+        'name',
+        'image',
+        'image_variants_of',
+        'text',
+        'cooking_time',
+        'favorites_count',
+        'author_id',
+        'author__email',
+        'author__username',
+        'author__first_name',
+        'author__last_name',
+        'author__avatar',
+        'author__avatar_variants_of',
+    )
+    page_fields = ('id', 'updated_at', 'author_id')
+    flag_fields = ('is_favorited', 'is_in_shopping_cart')
+
+    def __init__(self, request):
+        self.request = request
+        self.image_field = Recipe._meta.get_field('image')
+        self.avatar_field = User._meta.get_field('avatar')
+        self.images = {}
+
+    def values(self, queryset):
+        fields = self.page_fields
+        if self.request.user.is_authenticated:
+            fields += self.flag_fields
+        return queryset.prefetch_related(None).values(*fields)
+
+    def get_key(self, row):
+        # Image urls are absolute, so fragments differ between hosts.
+        return FRAGMENT_KEY.format(
+            row['id'],
+            row['updated_at'].isoformat(),
+            self.request.build_absolute_uri('/'),
+        )
+
+    def image(self, field, name, variants_of, variants):
+        """Url and variant urls of a stored file, computed once per name."""
+        key = (field.name, name, variants_of)
+        if key not in self.images:
+            instance = field.model(**{recorded_field_name(field): variants_of})
+            field_file = field.attr_class(instance, field, name)
+            if field_file:
+                self.images[key] = (
+                    self.request.build_absolute_uri(field_file.url),
+                    variant_urls(
+                        field_file, variants, self.request.build_absolute_uri
+                    ),
+                )
+            else:
+                self.images[key] = (None, None)
+        return self.images[key]
+
+    def get_tags(self, recipe_ids):
+        tags = defaultdict(list)
+        for row in RecipeTags.objects.filter(
+                recipe_id__in=recipe_ids).order_by('tag_id').values(
+                'recipe_id', 'tag_id', 'tag__name', 'tag__slug'):
+            tags[row['recipe_id']].append({
+                'id': row['tag_id'],
+                'name': row['tag__name'],
+                'slug': row['tag__slug'],
+            })
+        return tags
+
+    def get_ingredients(self, recipe_ids):
+        ingredients = defaultdict(list)
+        for row in RecipeIngredient.objects.filter(
+                recipe_id__in=recipe_ids).values(
+                'recipe_id', 'ingredient_id', 'ingredient__name',
+                'ingredient__measurement_unit', 'amount'):
+            ingredients[row['recipe_id']].append({
+                'id': row['ingredient_id'],
+                'name': row['ingredient__name'],
+                'measurement_unit': row['ingredient__measurement_unit'],
+                'amount': row['amount'],
+            })
+        return ingredients
+
+    def build_fragments(self, recipe_ids):
+        """Recipes without the viewer's flags, which are left ``False``."""
+        tags = self.get_tags(recipe_ids)
+        ingredients = self.get_ingredients(recipe_ids)
+        fragments = {}
+        for row in Recipe.objects.filter(pk__in=recipe_ids).values(
+                *self.fields):
+            image, image_variants = self.image(
+                self.image_field,
+                row['image'],
+                row['image_variants_of'],
+                c.RECIPE_IMAGE_VARIANTS,
+            )
+            avatar, avatar_variants = self.image(
+                self.avatar_field,
+                row['author__avatar'],
+                row['author__avatar_variants_of'],
+                c.AVATAR_VARIANTS,
+            )
+            fragments[row['id']] = {
+                'id': row['id'],
+                'tags': tags.get(row['id'], []),
+                'author': {
+                    'id': row['author_id'],
+                    'email': row['author__email'],
+                    'username': row['author__username'],
+                    'first_name': row['author__first_name'],
+                    'last_name': row['author__last_name'],
+                    'is_subscribed': False,
+                    'avatar': avatar,
+                    'avatar_variants': avatar_variants,
+                },
+                'ingredients': ingredients.get(row['id'], []),
+                'is_favorited': False,
+                'is_in_shopping_cart': False,
+                'favorites_count': row['favorites_count'],
+                'name': row['name'],
+                'image': image,
+                'image_variants': image_variants,
+                'text': row['text'],
+                'cooking_time': row['cooking_time'],
+            }
+        return fragments
+
+    def get_fragments(self, rows):
+        keys = {row['id']: self.get_key(row) for row in rows}
+        cached = cache.get_many(keys.values())
+        fragments = {
+            recipe_id: cached[key]
+            for recipe_id, key in keys.items()
+            if key in cached
+        }
+        missing = [
+            recipe_id for recipe_id in keys if recipe_id not in fragments
+        ]
+        if missing:
+            built = self.build_fragments(missing)
+            cache.set_many(
+                {
+                    keys[recipe_id]: fragment
+                    for recipe_id, fragment in built.items()
+                },
+                c.RECIPE_FRAGMENT_CACHE_TIMEOUT,
+            )
+            fragments.update(built)
+        return fragments
+
+    def serialize(self, rows):
+        rows = list(rows)
+        fragments = self.get_fragments(rows)
+        if not self.request.user.is_authenticated:
+            return [fragments[row['id']] for row in rows]
+        followed = get_followed_author_ids(self.request)
+        data = []
+        for row in rows:
+            # Overwriting keeps the key order of the DRF serializer.
+            recipe = dict(fragments[row['id']])
+            recipe['author'] = dict(
+                recipe['author'], is_subscribed=row['author_id'] in followed
+            )
+            recipe['is_favorited'] = row['is_favorited']
+            recipe['is_in_shopping_cart'] = row['is_in_shopping_cart']
+            data.append(recipe)
+        return data
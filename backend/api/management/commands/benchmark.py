@@ -0,0 +1,580 @@
+import base64
+import io
+import json
+import math
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_databases, setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from django.urls import URLResolver, get_resolver, reverse
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.flat_serializers import FlatRecipeSerializer
+from api.serializers import RecipeReadSerializer
+from foodgram import constants as c
+from foodgram.metrics import RequestTimer
+from jobs.models import Job
+from recipes.models import (Ingredient, Recipe, RecipeIngredient, RecipeTags,
+                            ShortLink, Tag)
+from users.models import Follow, User
+
+# ``data`` names the dataset entry sent as the JSON body. ``prepare`` and
+# ``cleanup`` name ``prepare_*`` and ``cleanup_*`` methods of the command
+# run around every request.
+Scenario = namedtuple(
+    'Scenario',
+    ('name', 'url_name', 'kwargs', 'query', 'method', 'auth_only', 'cleanup',
+     'data', 'prepare'),
+    defaults=({}, '', 'get', False, None, None, None),
+)
+
+SCENARIOS = (
+    Scenario('api-root', 'api:api-root', auth_only=True),
+    Scenario('tags-list', 'api:tags-list'),
+    Scenario('tags-detail', 'api:tags-detail', {'pk': 'tag'}),
+    Scenario('ingredients-list', 'api:ingredients-list'),
+    Scenario('ingredients-search', 'api:ingredients-list',
+             query='name=ing'),
+    Scenario('ingredients-detail', 'api:ingredients-detail',
+             {'pk': 'ingredient'}),
+    Scenario('recipes-list', 'api:recipes-list'),
+    Scenario('recipes-list-100', 'api:recipes-list', query='limit=100'),
+    Scenario('recipes-list-tags', 'api:recipes-list',
+             query='{tag_slugs}'),
+    Scenario('recipes-list-author', 'api:recipes-list',
+             query='author={author}'),
+    Scenario('recipes-list-search', 'api:recipes-list', query='search=5'),
+    Scenario('recipes-list-favorited', 'api:recipes-list',
+             query='is_favorited=1', auth_only=True),
+    Scenario('recipes-list-in-cart', 'api:recipes-list',
+             query='is_in_shopping_cart=1', auth_only=True),
+    Scenario('recipes-detail', 'api:recipes-detail', {'pk': 'recipe'}),
+    Scenario('recipes-get-link', 'api:recipes-get-link', {'pk': 'recipe'}),
+    Scenario('short-link', 'short_url', {'code': 'code'}),
+    Scenario('recipes-favorite', 'api:recipes-favorite',
+             {'pk': 'other_recipe'}, method='post', auth_only=True,
+             cleanup='delete'),
+    Scenario('recipes-shopping-cart', 'api:recipes-shopping_cart',
+             {'pk': 'other_recipe'}, method='post', auth_only=True,
+             cleanup='delete'),
+    Scenario('recipes-download-shopping-cart',
+             'api:recipes-download_shopping_cart', auth_only=True),
+    Scenario('recipes-create', 'api:recipes-list', method='post',
+             auth_only=True, cleanup='created_recipe', data='recipe_data'),
+    Scenario('recipes-update', 'api:recipes-detail', {'pk': 'recipe'},
+             method='patch', auth_only=True, data='recipe_update'),
+    Scenario('recipes-delete', 'api:recipes-detail', {'pk': 'fresh_recipe'},
+             method='delete', auth_only=True, prepare='recipe'),
+    Scenario('users-list', 'api:users-list'),
+    Scenario('users-detail', 'api:users-detail', {'id': 'author'}),
+    Scenario('users-me', 'api:users-me', auth_only=True),
+    Scenario('users-subscriptions', 'api:users-subscriptions',
+             auth_only=True),
+    Scenario('users-subscribe', 'api:users-subscribe', {'id': 'stranger'},
+             method='post', auth_only=True, cleanup='delete'),
+    Scenario('jobs-list', 'api:jobs-list', auth_only=True),
+    Scenario('jobs-detail', 'api:jobs-detail', {'pk': 'job'},
+             auth_only=True),
+)
+
+ScalingCheck = namedtuple(
+    'ScalingCheck',
+    ('name', 'url_name', 'parameter', 'sizes', 'auth_only'),
+    defaults=(False,),
+)
+
+# Page size must not change the number of queries on these routes.
+SCALING_CHECKS = (
+    ScalingCheck('recipes-list', 'api:recipes-list', 'limit',
+                 (c.PAGE_SIZE, 100)),
+    ScalingCheck('users-list', 'api:users-list', 'limit',
+                 (c.PAGE_SIZE, 100)),
+    ScalingCheck('users-subscriptions', 'api:users-subscriptions', 'limit',
+                 (1, c.BENCHMARK_FOLLOWS), auth_only=True),
+    ScalingCheck('users-subscriptions-recipes', 'api:users-subscriptions',
+                 'recipes_limit', (1, 10), auth_only=True),
+)
+
+BUDGETS_PATH = os.path.join(settings.BASE_DIR, 'api', 'benchmark_budgets.json')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = ('Benchmark API endpoints on a seeded test database against '
+            'stored query and latency budgets')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=c.BENCHMARK_USERS,
+            help='Number of seeded users',
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=c.BENCHMARK_RECIPES,
+            help='Number of seeded recipes',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed of the dataset',
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=c.BENCHMARK_ITERATIONS,
+            help='Measured requests per endpoint and user',
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=c.BENCHMARK_WARMUP,
+            help='Unmeasured requests per endpoint and user',
+        )
+        parser.add_argument(
+            '--budgets',
+            default=BUDGETS_PATH,
+            help='JSON file with query and latency budgets',
+        )
+        parser.add_argument(
+            '--save-budgets',
+            action='store_true',
+            help='Write the measured values as the new budgets',
+        )
+        parser.add_argument(
+            '--ignore-latency',
+            action='store_true',
+            help='Only enforce query budgets',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the results to this JSON file',
+        )
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        databases = setup_databases(verbosity=0, interactive=False)
+        media_root = tempfile.mkdtemp()
+        try:
+            with override_settings(
+                MEDIA_ROOT=media_root, JOBS_EAGER=False, CACHES=CACHES
+            ):
+                dataset = self.seed(options)
+                report = self.benchmark(dataset, options)
+        finally:
+            teardown_databases(databases, verbosity=0)
+            teardown_test_environment()
+            shutil.rmtree(media_root, ignore_errors=True)
+        if report['not_benchmarked']:
+            self.stdout.write(
+                'Not benchmarked: ' + ', '.join(report['not_benchmarked'])
+            )
+        violations = self.check_budgets(report, options)
+        report['violations'] = violations
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+        if options['save_budgets']:
+            self.save_budgets(report, options['budgets'])
+        elif violations:
+            raise CommandError(
+                f'{len(violations)} budget violation(s):\n'
+                + '\n'.join(violations)
+            )
+        else:
+            self.stdout.write(self.style.SUCCESS('All budgets met.'))
+
+    def seed(self, options):
+        started = time.perf_counter()
+        users = options['users']
+        call_command(
+            'seed',
+            users=users,
+            recipes=options['recipes'],
+            follows=users * c.BENCHMARK_FOLLOWS,
+            favorites=users * c.BENCHMARK_FAVORITES,
+            carts=users * c.BENCHMARK_FAVORITES,
+            seed=options['seed'],
+            stdout=io.StringIO(),
+        )
+        call_command('create_short_links', stdout=io.StringIO())
+
+        user = User.objects.order_by('id').first()
+        followed = Follow.objects.filter(user=user).values('author')
+        own = (
+            Recipe.objects.filter(author=user).first()
+            or Recipe.objects.first()
+        )
+        tags = Tag.objects.order_by('id')
+        ingredients = Ingredient.objects.order_by('id').values_list(
+            'id', flat=True
+        )
+        recipe_update = {
+            'name': 'Benchmark recipe',
+            'text': 'Created and changed by the benchmark.',
+            'cooking_time': 10,
+            'tags': [tag.pk for tag in tags[:2]],
+            'ingredients': [
+                {'id': pk, 'amount': amount}
+                for amount, pk in enumerate(ingredients[:5], 1)
+            ],
+        }
+        image = io.BytesIO()
+        Image.new('RGB', (8, 8), 'white').save(image, 'PNG')
+        dataset = {
+            'user': user.pk,
+            'image': own.image.name,
+            'recipe_update': recipe_update,
+            'recipe_data': {
+                **recipe_update,
+                'image': 'data:image/png;base64,'
+                         + base64.b64encode(image.getvalue()).decode(),
+            },
+            'tag': tags[0].pk,
+            'tag_slugs': '&'.join(f'tags={tag.slug}' for tag in tags[:2]),
+            'ingredient': Ingredient.objects.first().pk,
+            'recipe': own.pk,
+            'author': own.author_id,
+            'other_recipe': Recipe.objects.exclude(
+                favorite__user=user
+            ).exclude(shopping_list__user=user).first().pk,
+            'stranger': User.objects.exclude(pk=user.pk).exclude(
+                pk__in=followed
+            ).first().pk,
+            'code': ShortLink.objects.get(recipe=own).code,
+            'job': Job.objects.create(
+                name='benchmark', user=user, run_at=timezone.now()
+            ).pk,
+            'token': Token.objects.create(user=user).key,
+        }
+        self.stdout.write(
+            f'Seeded {users} users and {options["recipes"]} recipes in '
+            f'{time.perf_counter() - started:.1f}s.'
+        )
+        return dataset
+
+    def get_path(self, url_name, kwargs, query, dataset):
+        path = reverse(url_name, kwargs={
+            key: dataset[value] for key, value in kwargs.items()
+        })
+        query = query.format(**dataset)
+        return f'{path}?{query}' if query else path
+
+    def request(self, client, method, path, data=None):
+        # connection.queries keeps times in milliseconds with three
+        # decimals, too coarse for most queries, so time them directly.
+        timer = RequestTimer()
+        kwargs = {} if data is None else {
+            'data': data, 'content_type': 'application/json'
+        }
+        with CaptureQueriesContext(connection) as queries, \
+                connection.execute_wrapper(timer.execute):
+            started = time.perf_counter()
+            response = getattr(client, method)(path, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        if response.status_code >= 400:
+            raise CommandError(
+                f'{method.upper()} {path} returned {response.status_code}'
+            )
+        return response, elapsed, queries.captured_queries, timer.db
+
+    def count_cold_queries(self, client, path):
+        # Cached pages and fragments would hide queries that grow with size.
+        cache.clear()
+        return len(self.request(client, 'get', path)[2])
+
+    def prepare_recipe(self, dataset):
+        """A recipe of the benchmark user for every delete."""
+        data = dataset['recipe_update']
+        recipe = Recipe.objects.create(
+            author_id=dataset['user'],
+            name=data['name'],
+            text=data['text'],
+            cooking_time=data['cooking_time'],
+            image=dataset['image'],
+        )
+        RecipeTags.objects.bulk_create(
+            RecipeTags(recipe=recipe, tag_id=pk) for pk in data['tags']
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe, ingredient_id=item['id'], amount=item['amount']
+            )
+            for item in data['ingredients']
+        )
+        dataset['fresh_recipe'] = recipe.pk
+
+    def cleanup_delete(self, client, path, response):
+        self.request(client, 'delete', path)
+
+    def cleanup_created_recipe(self, client, path, response):
+        Recipe.objects.filter(pk=response.json()['id']).delete()
+
+    def measure(self, client, scenario, dataset, options):
+        samples = []
+        data = dataset[scenario.data] if scenario.data else None
+        for iteration in range(options['warmup'] + options['iterations']):
+            if scenario.prepare:
+                getattr(self, f'prepare_{scenario.prepare}')(dataset)
+            path = self.get_path(
+                scenario.url_name, scenario.kwargs, scenario.query, dataset
+            )
+            response, elapsed, queries, db = self.request(
+                client, scenario.method, path, data
+            )
+            if scenario.cleanup:
+                getattr(self, f'cleanup_{scenario.cleanup}')(
+                    client, path, response
+                )
+            if iteration >= options['warmup']:
+                samples.append((elapsed, queries, db))
+        latencies = [elapsed * 1000 for elapsed, _, _ in samples]
+        return {
+            'path': path,
+            'status': response.status_code,
+            'queries': max(len(queries) for _, queries, _ in samples),
+            'db_ms': statistics.median(db * 1000 for _, _, db in samples),
+            'p50_ms': percentile(latencies, 0.5),
+            'p95_ms': percentile(latencies, 0.95),
+        }
+
+    def benchmark(self, dataset, options):
+        clients = {
+            'anon': Client(),
+            'auth': Client(HTTP_AUTHORIZATION=f'Token {dataset["token"]}'),
+        }
+        results = []
+        for scenario in SCENARIOS:
+            for user, client in clients.items():
+                if scenario.auth_only and user == 'anon':
+                    continue
+                result = {
+                    'name': scenario.name,
+                    'user': user,
+                    'method': scenario.method.upper(),
+                    **self.measure(client, scenario, dataset, options),
+                }
+                results.append(result)
+                self.stdout.write(
+                    f'{scenario.name:<32} {user:<4} '
+                    f'{result["queries"]:>3} queries '
+                    f'db {result["db_ms"]:7.2f}ms '
+                    f'p50 {result["p50_ms"]:7.2f}ms '
+                    f'p95 {result["p95_ms"]:7.2f}ms'
+                )
+        scaling = []
+        for check in SCALING_CHECKS:
+            for user, client in clients.items():
+                if check.auth_only and user == 'anon':
+                    continue
+                scaling.append({
+                    'name': check.name,
+                    'user': user,
+                    'parameter': check.parameter,
+                    'sizes': check.sizes,
+                    'queries': [
+                        self.count_cold_queries(client, self.get_path(
+                            check.url_name, {},
+                            f'{check.parameter}={size}', dataset,
+                        ))
+                        for size in check.sizes
+                    ],
+                })
+        for check in scaling:
+            self.stdout.write(
+                f'{check["name"]:<32} {check["user"]:<4} '
+                f'{check["parameter"]} {check["sizes"]}: '
+                f'{check["queries"]} queries'
+            )
+        serializers = [
+            self.compare_serializers(user, options)
+            for user in (AnonymousUser(), User.objects.get(
+                auth_token__key=dataset['token']
+            ))
+        ]
+        for result in serializers:
+            self.stdout.write(
+                f'{"recipe serializers":<32} {result["user"]:<4} '
+                f'{result["rows"]} rows: '
+                f'drf {result["drf_us_per_row"]:7.1f}us/row '
+                f'flat {result["flat_us_per_row"]:7.1f}us/row '
+                f'cached {result["flat_cached_us_per_row"]:7.1f}us/row'
+            )
+        return {
+            'created_at': timezone.now().isoformat(),
+            'vendor': connection.vendor,
+            'dataset': {
+                'users': options['users'],
+                'recipes': options['recipes'],
+                'seed': options['seed'],
+            },
+            'iterations': options['iterations'],
+            'results': results,
+            'scaling': scaling,
+            'serializers': serializers,
+            'not_benchmarked': self.get_uncovered_routes(),
+        }
+
+    def compare_serializers(self, user, options):
+        """Render a page with both recipe serializers and time them.
+
+        Both sides include their queries and the per-row CPU is measured
+        with ``process_time`` over the measured iterations. The flat path
+        is measured with an empty and with a filled fragment cache.
+        """
+        limit = c.BENCHMARK_SERIALIZER_ROWS
+        renderer = JSONRenderer()
+
+        def drf():
+            request = APIRequestFactory().get('/api/recipes/')
+            request.user = user
+            recipes = Recipe.objects.with_related().with_user_flags(user)
+            return renderer.render(RecipeReadSerializer(
+                recipes[:limit], many=True, context={'request': request}
+            ).data)
+
+        def flat_cold():
+            cache.clear()
+            return flat()
+
+        def flat():
+            request = APIRequestFactory().get('/api/recipes/')
+            request.user = user
+            serializer = FlatRecipeSerializer(request)
+            recipes = Recipe.objects.with_related().with_user_flags(user)
+            return renderer.render(
+                serializer.serialize(serializer.values(recipes)[:limit])
+            )
+
+        result = {
+            'user': 'auth' if user.is_authenticated else 'anon',
+            'rows': Recipe.objects.all()[:limit].count(),
+        }
+        for name, render in (
+                ('drf', drf), ('flat', flat_cold), ('flat_cached', flat)):
+            for _ in range(options['warmup']):
+                render()
+            started = time.process_time()
+            for _ in range(options['iterations']):
+                render()
+            result[f'{name}_us_per_row'] = (
+                (time.process_time() - started) * 1e6
+                / (options['iterations'] * max(result['rows'], 1))
+            )
+        return result
+
+    def get_routes(self, patterns):
+        """Names and HTTP methods of the views under ``patterns``."""
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                yield from self.get_routes(pattern.url_patterns)
+                continue
+            if not pattern.name:
+                continue
+            callback = pattern.callback
+            view_class = getattr(callback, 'cls', None) or getattr(
+                callback, 'view_class', None
+            )
+            if getattr(callback, 'actions', None):
+                methods = callback.actions
+            elif view_class is not None:
+                methods = [
+                    method for method in view_class.http_method_names
+                    if hasattr(view_class, method)
+                ]
+            else:
+                methods = ['get']
+            for method in methods:
+                if method not in ('head', 'options'):
+                    yield f'api:{pattern.name}', method.upper()
+
+    def get_uncovered_routes(self):
+        covered = {
+            (scenario.url_name, scenario.method.upper())
+            for scenario in SCENARIOS
+        }
+        api = get_resolver().namespace_dict['api'][1]
+        return sorted(
+            f'{name} {method}'
+            for name, method in set(self.get_routes(api.url_patterns))
+            if (name, method) not in covered
+        )
+
+    def check_budgets(self, report, options):
+        violations = []
+        for check in report['scaling']:
+            if len(set(check['queries'])) > 1:
+                violations.append(
+                    f'{check["name"]} ({check["user"]}): query count grows '
+                    f'with {check["parameter"]} {check["sizes"]}: '
+                    f'{check["queries"]}'
+                )
+        if options['save_budgets'] or not os.path.exists(options['budgets']):
+            return violations
+        with open(options['budgets'], encoding='utf-8') as file:
+            budgets = json.load(file)
+        for result in report['results']:
+            key = f'{result["name"]}:{result["user"]}'
+            budget = budgets.get(key)
+            if budget is None:
+                self.stdout.write(self.style.WARNING(f'No budget for {key}'))
+                continue
+            if result['queries'] > budget['queries']:
+                violations.append(
+                    f'{key}: {result["queries"]} queries, '
+                    f'budget {budget["queries"]}'
+                )
+            if (not options['ignore_latency']
+                    and result['p95_ms'] > budget['p95_ms']):
+                violations.append(
+                    f'{key}: p95 {result["p95_ms"]:.2f}ms, '
+                    f'budget {budget["p95_ms"]}ms'
+                )
+        return violations
+
+    def save_budgets(self, report, path):
+        budgets = {
+            f'{result["name"]}:{result["user"]}': {
+                'queries': result['queries'],
+                'p95_ms': max(
+                    math.ceil(result['p95_ms'] * c.BENCHMARK_LATENCY_HEADROOM),
+                    c.BENCHMARK_MIN_LATENCY_BUDGET,
+                ),
+            }
+            for result in report['results']
+        }
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(budgets, file, indent=2, sort_keys=True)
+            file.write('\n')
+        self.stdout.write(self.style.SUCCESS(f'Budgets written to {path}.'))
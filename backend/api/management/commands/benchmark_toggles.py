@@ -0,0 +1,149 @@
+import json
+import math
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Q
+from rest_framework.authtoken.models import Token
+
+from foodgram import constants as c
+from recipes.models import Recipe
+from users.models import User
+
+ENDPOINTS = {
+    'favorite': 'api/recipes/{recipe}/favorite/',
+    'shopping_cart': 'api/recipes/{recipe}/shopping_cart/',
+    'subscribe': 'api/users/{author}/subscribe/',
+}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = ('Measure concurrent favorite, shopping cart and subscribe '
+            'toggle throughput of a running server, e.g. to compare the '
+            'wsgi and asgi deployment profiles')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'url',
+            help='Base url of a server using the same database, '
+                 'e.g. http://127.0.0.1:9090/',
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=c.TOGGLE_BENCHMARK_USERS,
+            help='Number of concurrent users, one connection each',
+        )
+        parser.add_argument(
+            '--rounds',
+            type=int,
+            default=c.TOGGLE_BENCHMARK_ROUNDS,
+            help='Add and remove pairs per user and endpoint',
+        )
+        parser.add_argument(
+            '--endpoint',
+            choices=ENDPOINTS,
+            action='append',
+            help='Endpoint to benchmark, all of them by default',
+        )
+        parser.add_argument(
+            '--output',
+            help='Write the results to this JSON file',
+        )
+
+    def handle(self, *args, **options):
+        base_url = options['url'].rstrip('/') + '/'
+        targets = self.get_targets(options['users'])
+        results = []
+        for endpoint in options['endpoint'] or ENDPOINTS:
+            paths = [
+                base_url + ENDPOINTS[endpoint].format(**target)
+                for target in targets
+            ]
+            result = self.run(endpoint, paths, targets, options['rounds'])
+            results.append(result)
+            self.stdout.write(
+                f'{endpoint:<14} {result["requests"]:>6} requests '
+                f'{result["requests_per_second"]:8.1f} req/s '
+                f'p50 {result["p50_ms"]:7.2f}ms '
+                f'p95 {result["p95_ms"]:7.2f}ms '
+                f'errors {result["errors"]}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump({'url': base_url, 'results': results}, file,
+                          indent=2)
+        if any(result['errors'] for result in results):
+            raise CommandError('Some toggles returned unexpected statuses.')
+
+    def get_targets(self, count):
+        """A token, a recipe and an author to toggle for every user."""
+        users = list(User.objects.filter(is_active=True).order_by('id')[
+            :count
+        ])
+        if len(users) < count:
+            raise CommandError(f'At least {count} users are required.')
+        targets = []
+        for user in users:
+            recipe = Recipe.objects.exclude(
+                Q(author=user) | Q(favorite__user=user)
+                | Q(shopping_list__user=user)
+            ).order_by('id').first()
+            author = User.objects.exclude(pk=user.pk).exclude(
+                following__user=user
+            ).order_by('id').first()
+            if recipe is None or author is None:
+                raise CommandError(f'Nothing to toggle for {user}.')
+            targets.append({
+                'token': Token.objects.get_or_create(user=user)[0].key,
+                'recipe': recipe.pk,
+                'author': author.pk,
+            })
+        return targets
+
+    def toggle(self, path, token, rounds):
+        latencies = []
+        errors = 0
+        with requests.Session() as session:
+            session.headers['Authorization'] = f'Token {token}'
+            for _ in range(rounds):
+                for method, expected in (('post', 201), ('delete', 204)):
+                    started = time.perf_counter()
+                    response = getattr(session, method)(path)
+                    latencies.append(time.perf_counter() - started)
+                    errors += response.status_code != expected
+        return latencies, errors
+
+    def run(self, endpoint, paths, targets, rounds):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(paths)) as executor:
+            outcomes = list(executor.map(
+                self.toggle,
+                paths,
+                [target['token'] for target in targets],
+                [rounds] * len(paths),
+            ))
+        elapsed = time.perf_counter() - started
+        latencies = [
+            latency * 1000
+            for user_latencies, _ in outcomes
+            for latency in user_latencies
+        ]
+        return {
+            'endpoint': endpoint,
+            'users': len(paths),
+            'requests': len(latencies),
+            'errors': sum(errors for _, errors in outcomes),
+            'seconds': elapsed,
+            'requests_per_second': len(latencies) / elapsed,
+            'p50_ms': statistics.median(latencies),
+            'p95_ms': percentile(latencies, 0.95),
+        }
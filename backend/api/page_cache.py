@@ -0,0 +1,82 @@
+import hashlib
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from rest_framework.response import Response
+
+from foodgram import constants as c
+from foodgram.replicas import primary_reads
+from recipes.cache import get_version
+
+PAGE_KEY = 'page:{}:{}'
+CACHED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Vary',
+                  'Cache-Control')
+
+
+class AnonymousPageCache:
+    """Rendered JSON responses for anonymous GET requests.
+
+    Keys contain the recipe catalog version, which moves on every write
+    that changes a recipe, so entries never need to be deleted one by one.
+    Favorite counters do not move it and may lag by the cache timeout.
+    """
+
+    def __init__(self, version_name, timeout):
+        self.version_name = version_name
+        self.timeout = timeout
+
+    def is_cacheable(self, request):
+        return (
+            request.method == 'GET'
+            and not request.user.is_authenticated
+            and request.accepted_renderer.format == 'json'
+        )
+
+    def get_key(self, request):
+        query = sorted(
+            (name, sorted(values))
+            for name, values in request.query_params.lists()
+        )
+        parts = [request.build_absolute_uri(request.path), query]
+        return PAGE_KEY.format(
+            get_version(self.version_name),
+            hashlib.md5(repr(parts).encode()).hexdigest(),
+        )
+
+    def response(self, request, get_response):
+        if not self.is_cacheable(request):
+            return get_response()
+        key = self.get_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            return get_conditional_response(
+                request,
+                etag=entry['headers'].get('ETag'),
+                last_modified=parse_http_date_safe(
+                    entry['headers'].get('Last-Modified', '')
+                ),
+            ) or HttpResponse(entry['content'], headers=entry['headers'])
+        with primary_reads():
+            response = get_response()
+        if isinstance(response, Response) and response.status_code == 200:
+            response.add_post_render_callback(
+                lambda response: self.store(key, response)
+            )
+        return response
+
+    def store(self, key, response):
+        cache.set(key, {
+            'content': response.content,
+            'headers': {
+                name: response[name]
+                for name in CACHED_HEADERS
+                if name in response
+            },
+        }, self.timeout)
+
+
+recipe_page_cache = AnonymousPageCache(
+    c.RECIPE_CATALOG_VERSION, c.RECIPE_PAGE_CACHE_TIMEOUT
+)
@@ -1,8 +1,41 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.pagination import CursorPagination, PageNumberPagination
 
 from foodgram import constants as c
 
 
+class CustomCursorPagination(CursorPagination):
+    page_size_query_param = 'limit'
+    page_size = c.PAGE_SIZE
+
+    def __init__(self, ordering):
+        self.ordering = ordering
+
+
 class CustomLimitPagination(PageNumberPagination):
+    """Page numbers, or keyset pages on the model ordering with ?cursor=.
+
+    Querysets with an ordering of their own, such as search results
+    ordered by rank, cannot be paged by the model ordering and always
+    use page numbers.
+    """
+
     page_size_query_param = 'limit'
     page_size = c.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    cursor_paginator = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if (self.cursor_query_param not in request.query_params
+                or queryset.query.order_by):
+            return super().paginate_queryset(queryset, request, view)
+        self.cursor_paginator = CustomCursorPagination(
+            queryset.model._meta.ordering
+        )
+        return self.cursor_paginator.paginate_queryset(
+            queryset, request, view
+        )
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is None:
+            return super().get_paginated_response(data)
+        return self.cursor_paginator.get_paginated_response(data)
@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+from abc import ABCMeta, abstractmethod
+
+from django.conf import settings
+from PIL import Image, ImageDraw, ImageFont
+from rest_framework import renderers
+
+from foodgram import constants as c
+
+
+class ShoppingCartRenderer(renderers.BaseRenderer, metaclass=ABCMeta):
+    """Streams shopping cart rows; errors are rendered as JSON by the view."""
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''
+
+    @staticmethod
+    def format_row(row):
+        return (
+            f'{row["ingredient__name"]} - {row["sum"]} '
+            f'({row["ingredient__measurement_unit"]})'
+        )
+
+    @abstractmethod
+    def stream(self, rows):
+        """Yield the rendered shopping cart in chunks of bytes."""
+
+
+class ShoppingCartTXTRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, rows):
+        for index, row in enumerate(rows):
+            line = self.format_row(row)
+            yield (f'\n{line}' if index else line).encode(self.charset)
+
+
+class ShoppingCartCSVRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(('name', 'measurement_unit', 'amount'))
+        for row in rows:
+            writer.writerow((
+                row['ingredient__name'],
+                row['ingredient__measurement_unit'],
+                row['sum'],
+            ))
+            yield buffer.getvalue().encode(self.charset)
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue().encode(self.charset)
+
+
+class ShoppingCartJSONRenderer(ShoppingCartRenderer):
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, rows):
+        yield b'['
+        for index, row in enumerate(rows):
+            item = json.dumps(
+                {
+                    'name': row['ingredient__name'],
+                    'measurement_unit': row['ingredient__measurement_unit'],
+                    'amount': row['sum'],
+                },
+                ensure_ascii=False,
+            )
+            yield (f',{item}' if index else item).encode(self.charset)
+        yield b']'
+
+
+class ShoppingCartPDFRenderer(ShoppingCartRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+
+    @staticmethod
+    def get_font():
+        try:
+            return ImageFont.truetype(
+                settings.SHOPPING_CART_PDF_FONT,
+                c.SHOPPING_CART_PDF_FONT_SIZE,
+            )
+        except OSError:
+            return ImageFont.load_default(c.SHOPPING_CART_PDF_FONT_SIZE)
+
+    def stream(self, rows):
+        font = self.get_font()
+        line_height = int(c.SHOPPING_CART_PDF_FONT_SIZE * 1.5)
+        width, height = c.SHOPPING_CART_PDF_PAGE_SIZE
+        margin = c.SHOPPING_CART_PDF_MARGIN
+        pages = []
+        draw = None
+        y = height
+        for row in rows:
+            if y + line_height > height - margin:
+                pages.append(Image.new('L', (width, height), 255))
+                draw = ImageDraw.Draw(pages[-1])
+                y = margin
+            draw.text((margin, y), self.format_row(row), fill=0, font=font)
+            y += line_height
+        if not pages:
+            pages.append(Image.new('L', (width, height), 255))
+        buffer = io.BytesIO()
+        pages[0].save(
+            buffer,
+            'PDF',
+            save_all=True,
+            append_images=pages[1:],
+            resolution=c.SHOPPING_CART_PDF_RESOLUTION,
+        )
+        yield buffer.getvalue()
+
+
+SHOPPING_CART_RENDERERS = (
+    ShoppingCartTXTRenderer,
+    ShoppingCartCSVRenderer,
+    ShoppingCartJSONRenderer,
+    ShoppingCartPDFRenderer,
+)
@@ -2,17 +2,59 @@ import base64
 
 from django.contrib.auth import get_user_model
 from django.core.files.base import ContentFile
+from django.db import transaction
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from rest_framework import serializers
 
 from foodgram import constants as c
+from foodgram.images import variant_urls
+from foodgram.metrics import serializing
+from jobs.models import Job
+from recipes.cache import bump_version_on_commit
 from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            RecipeTags, ShoppingList, Tag)
+                            RecipeTags, ShoppingList, Tag, get_tags_mask)
 from users.models import Follow
 
 User = get_user_model()
 
 
+def get_recipes_limit(request):
+    try:
+        return max(int(request.GET.get('recipes_limit', c.PAGE_SIZE)), 0)
+    except ValueError:
+        return c.PAGE_SIZE
+
+
+def get_followed_author_ids(request):
+    """Ids of authors the requesting user follows, loaded once per request."""
+    if not hasattr(request, '_followed_author_ids'):
+        request._followed_author_ids = set(
+            request.user.follower.values_list('author_id', flat=True)
+        )
+    return request._followed_author_ids
+
+
+class TimedListSerializer(serializers.ListSerializer):
+
+    @property
+    def data(self):
+        with serializing():
+            return super().data
+
+
+class TimedSerializerMixin:
+    """Count building ``data`` of a top-level serializer as serialization.
+
+    Serializers returned with ``many=True`` also use
+    ``TimedListSerializer`` as their ``list_serializer_class``.
+    """
+
+    @property
+    def data(self):
+        with serializing():
+            return super().data
+
+
 class Base64ImageField(serializers.ImageField):
 
     def to_internal_value(self, data):
@@ -23,13 +65,31 @@ class Base64ImageField(serializers.ImageField):
         return super().to_internal_value(data)
 
 
-class CustomUserSerializer(UserSerializer):
+class ImageVariantsField(serializers.Field):
+
+    def __init__(self, variants, **kwargs):
+        self.variants = variants
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        return variant_urls(
+            value, self.variants, request and request.build_absolute_uri
+        )
+
+
+class CustomUserSerializer(TimedSerializerMixin, UserSerializer):
 
     is_subscribed = serializers.SerializerMethodField()
     avatar = Base64ImageField(allow_null=True, required=False)
+    avatar_variants = ImageVariantsField(
+        source='avatar', variants=c.AVATAR_VARIANTS
+    )
 
     class Meta:
         model = User
+        list_serializer_class = TimedListSerializer
         fields = (
             'id',
             'email',
@@ -38,16 +98,17 @@ class CustomUserSerializer(UserSerializer):
             'last_name',
             'is_subscribed',
             'avatar',
+            'avatar_variants',
         )
 
     def get_is_subscribed(self, obj):
         request = self.context.get('request')
         if request is None or request.user.is_anonymous:
             return False
-        return request.user.follower.filter(author=obj).exists()
+        return obj.id in get_followed_author_ids(request)
 
 
-class CustomUserCreateSerializer(UserCreateSerializer):
+class CustomUserCreateSerializer(TimedSerializerMixin, UserCreateSerializer):
     password = serializers.CharField(write_only=True)
 
     class Meta:
@@ -62,7 +123,7 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         )
 
 
-class AvatarSerializer(serializers.ModelSerializer):
+class AvatarSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     avatar = Base64ImageField(allow_null=True)
 
     class Meta:
@@ -70,17 +131,19 @@ class AvatarSerializer(serializers.ModelSerializer):
         fields = ('avatar',)
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Tag
+        list_serializer_class = TimedListSerializer
         fields = ('id', 'name', 'slug')
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Ingredient
+        list_serializer_class = TimedListSerializer
         fields = ('id', 'name', 'measurement_unit')
 
 
@@ -110,7 +173,7 @@ class RecipeIngredientWriteSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     tags = TagSerializer(many=True)
     author = CustomUserSerializer()
@@ -120,6 +183,9 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_variants = ImageVariantsField(
+        source='image', variants=c.RECIPE_IMAGE_VARIANTS
+    )
 
     class Meta:
         model = Recipe
@@ -130,29 +196,33 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'ingredients',
             'is_favorited',
             'is_in_shopping_cart',
+            'favorites_count',
             'name',
             'image',
+            'image_variants',
             'text',
             'cooking_time',
         )
 
-    def check_user_status(self, obj, model_class):
+    def check_user_status(self, obj, model_class, annotation):
         user = self.context.get('request')
-        return bool(
-            user
-            and user.user.is_authenticated
-            and model_class.objects.filter(recipe=obj,
-                                           user=user.user).exists()
-        )
+        if not (user and user.user.is_authenticated):
+            return False
+        if hasattr(obj, annotation):
+            return getattr(obj, annotation)
+        return model_class.objects.filter(recipe=obj,
+                                          user=user.user).exists()
 
     def get_is_favorited(self, obj):
-        return self.check_user_status(obj, Favorite)
+        return self.check_user_status(obj, Favorite, 'is_favorited')
 
     def get_is_in_shopping_cart(self, obj):
-        return self.check_user_status(obj, ShoppingList)
+        return self.check_user_status(
+            obj, ShoppingList, 'is_in_shopping_cart'
+        )
 
 
-class RecipeWriteSerializer(serializers.ModelSerializer):
+class RecipeWriteSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     tags = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(),
         many=True,
@@ -194,43 +264,52 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                 'Please add ingredient'
             )
         ingredient_ids = [ingredient['id'] for ingredient in value]
-        existing_ingredients = Ingredient.objects.filter(id__in=ingredient_ids)
-        if len(existing_ingredients) != len(ingredient_ids):
-            missing_ids = set(ingredient_ids) - set(
-                existing_ingredients.values_list('id', flat=True)
-            )
+        self.existing_ingredients = Ingredient.objects.in_bulk(ingredient_ids)
+        if len(self.existing_ingredients) != len(ingredient_ids):
+            missing_ids = set(ingredient_ids) - set(self.existing_ingredients)
             raise serializers.ValidationError(
                 f'Ingredients with id {missing_ids} do not exist'
             )
         return value
 
     def to_representation(self, instance):
+        request = self.context.get('request')
+        instance = Recipe.objects.with_related().with_user_flags(
+            request.user
+        ).get(pk=instance.pk)
         serializer = RecipeReadSerializer(
-            instance, context={'request': self.context.get('request')}
+            instance, context={'request': request}
         )
         return serializer.data
 
     def create_tags(self, tags, recipe):
-        recipe.tags.set(tags)
+        RecipeTags.objects.bulk_create(
+            RecipeTags(recipe=recipe, tag=tag) for tag in tags
+        )
 
     def create_ingredients(self, ingredients, recipe):
-        for ingredient_data in ingredients:
-            ingredient_id = ingredient_data['id']
-            ingredient = Ingredient.objects.get(pk=ingredient_id)
-            amount = ingredient_data['amount']
-            RecipeIngredient.objects.create(
-                ingredient=ingredient, recipe=recipe, amount=amount
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(
+                recipe=recipe,
+                ingredient=self.existing_ingredients[ingredient_data['id']],
+                amount=ingredient_data['amount'],
             )
+            for ingredient_data in ingredients
+        )
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         user = self.context.get('request').user
-        recipe = Recipe.objects.create(**validated_data, author=user)
+        recipe = Recipe.objects.create(
+            **validated_data, author=user, tags_mask=get_tags_mask(tags)
+        )
         self.create_tags(tags, recipe)
         self.create_ingredients(ingredients, recipe)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         tags = validated_data.get('tags')
         if tags is None:
@@ -243,20 +322,33 @@ class RecipeWriteSerializer(serializers.ModelSerializer):
                 {'ingredients': 'Please add ingredient'}
             )
         RecipeTags.objects.filter(recipe=instance).delete()
-        RecipeIngredient.objects.filter(recipe=instance).delete()
+        instance.tags_mask = get_tags_mask(tags)
         self.create_tags(validated_data.pop('tags'), instance)
-        self.create_ingredients(validated_data.pop('ingredients'), instance)
+        amounts = {
+            (item['id'], item['amount'])
+            for item in validated_data.pop('ingredients')
+        }
+        stored = RecipeIngredient.objects.filter(recipe=instance)
+        if set(stored.values_list('ingredient_id', 'amount')) != amounts:
+            # Only ingredient changes invalidate cached shopping lists.
+            stored.delete()
+            self.create_ingredients(ingredients, instance)
+            bump_version_on_commit(c.RECIPE_INGREDIENTS_VERSION)
         return super().update(instance, validated_data)
 
 
 class ShortRecipeSerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField(
+        source='image', variants=c.RECIPE_IMAGE_VARIANTS
+    )
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
 
 
-class SubscriberDetailSerializer(serializers.ModelSerializer):
+class SubscriberDetailSerializer(TimedSerializerMixin,
+                                 serializers.ModelSerializer):
     email = serializers.ReadOnlyField(source='author.email')
     id = serializers.ReadOnlyField(source='author.id')
     username = serializers.ReadOnlyField(source='author.username')
@@ -264,11 +356,15 @@ class SubscriberDetailSerializer(serializers.ModelSerializer):
     last_name = serializers.ReadOnlyField(source='author.last_name')
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField(source='author.recipes_count')
     avatar = Base64ImageField(source='author.avatar')
+    avatar_variants = ImageVariantsField(
+        source='author.avatar', variants=c.AVATAR_VARIANTS
+    )
 
     class Meta:
         model = Follow
+        list_serializer_class = TimedListSerializer
         fields = (
             'email',
             'id',
@@ -279,30 +375,26 @@ class SubscriberDetailSerializer(serializers.ModelSerializer):
             'recipes',
             'recipes_count',
             'avatar',
+            'avatar_variants',
         )
 
     def get_is_subscribed(self, obj):
-        user = self.context.get('request').user
-        return Follow.objects.filter(author=obj.author, user=user).exists()
+        return obj.user_id == self.context.get('request').user.id
 
     def get_recipes(self, obj):
         request = self.context.get('request')
-        limit = request.GET.get('recipes_limit', c.PAGE_SIZE)
-        try:
-            limit = int(limit)
-        except ValueError:
-            pass
+        recipes = getattr(obj.author, 'latest_recipes', None)
+        if recipes is None:
+            limit = get_recipes_limit(request)
+            recipes = Recipe.objects.filter(author=obj.author)[:limit]
         return ShortRecipeSerializer(
-            Recipe.objects.filter(author=obj.author)[:limit],
+            recipes,
             many=True,
             context={'request': request},
         ).data
 
-    def get_recipes_count(self, obj):
-        return Recipe.objects.filter(author=obj.author).count()
-
 
-class SubscriberSerializer(serializers.ModelSerializer):
+class SubscriberSerializer(TimedSerializerMixin, serializers.ModelSerializer):
 
     class Meta:
         model = Follow
@@ -318,9 +410,30 @@ class SubscriberSerializer(serializers.ModelSerializer):
         return value
 
 
-class FavoriteRecipeSerializer(serializers.ModelSerializer):
+class FavoriteRecipeSerializer(TimedSerializerMixin,
+                               serializers.ModelSerializer):
     image = Base64ImageField()
+    image_variants = ImageVariantsField(
+        source='image', variants=c.RECIPE_IMAGE_VARIANTS
+    )
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_variants', 'cooking_time')
+
+
+class JobSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+
+    class Meta:
+        model = Job
+        list_serializer_class = TimedListSerializer
+        fields = (
+            'id',
+            'status',
+            'attempts',
+            'created_at',
+            'started_at',
+            'finished_at',
+            'duration',
+            'result',
+        )
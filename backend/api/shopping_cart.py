@@ -0,0 +1,49 @@
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Sum
+
+from api.renderers import SHOPPING_CART_RENDERERS
+from foodgram import constants as c
+from recipes.cache import get_version, shopping_cart_version_name
+from recipes.models import RecipeIngredient
+
+RENDERERS = {renderer.format: renderer for renderer in SHOPPING_CART_RENDERERS}
+
+
+def get_cache_key(user_id, renderer_format):
+    return 'shopping_cart:{}:{}:{}:{}'.format(
+        user_id,
+        get_version(shopping_cart_version_name(user_id)),
+        get_version(c.RECIPE_INGREDIENTS_VERSION),
+        renderer_format,
+    )
+
+
+def get_ingredients(user_id):
+    # The result is cached under the current versions, so it must not come
+    # from a lagging replica.
+    return (
+        RecipeIngredient.objects.using(DEFAULT_DB_ALIAS)
+        .filter(recipe__shopping_list__user=user_id)
+        .values('ingredient__name', 'ingredient__measurement_unit')
+        .annotate(sum=Sum('amount'))
+        .order_by('ingredient__name', 'ingredient__measurement_unit')
+        .iterator(chunk_size=c.SHOPPING_CART_CHUNK_SIZE)
+    )
+
+
+def stream_and_cache(chunks, cache_key):
+    content = []
+    for chunk in chunks:
+        content.append(chunk)
+        yield chunk
+    cache.set(cache_key, b''.join(content), c.SHOPPING_CART_CACHE_TIMEOUT)
+
+
+def render_shopping_cart(user_id, renderer_format):
+    cache_key = get_cache_key(user_id, renderer_format)
+    if cache.get(cache_key) is None:
+        chunks = RENDERERS[renderer_format]().stream(get_ingredients(user_id))
+        for _ in stream_and_cache(chunks, cache_key):
+            pass
+    return {'format': renderer_format}
@@ -0,0 +1,69 @@
+import gzip
+import hashlib
+import threading
+from collections import namedtuple
+
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.utils.http import parse_etags, quote_etag
+from rest_framework.renderers import JSONRenderer
+
+from foodgram.replicas import primary_reads
+from recipes.cache import get_version
+
+Snapshot = namedtuple('Snapshot', ('version', 'content', 'gzipped', 'etag'))
+
+
+class ReferenceSnapshot:
+    """Serialized, pre-gzipped copy of a nearly static list endpoint.
+
+    The snapshot is rebuilt only when the shared version of the underlying
+    table moves, so every other request is answered from memory.
+    """
+
+    def __init__(self, queryset, serializer_class, version_name):
+        self.queryset = queryset
+        self.serializer_class = serializer_class
+        self.version_name = version_name
+        self.snapshot = None
+        self.lock = threading.Lock()
+
+    def build(self, version):
+        with primary_reads():
+            data = self.serializer_class(self.queryset.all(), many=True).data
+        content = JSONRenderer().render(data)
+        return Snapshot(
+            version=version,
+            content=content,
+            gzipped=gzip.compress(content, mtime=0),
+            etag=quote_etag(hashlib.sha256(content).hexdigest()),
+        )
+
+    def get(self):
+        version = get_version(self.version_name)
+        snapshot = self.snapshot
+        if snapshot is None or snapshot.version != version:
+            with self.lock:
+                snapshot = self.snapshot
+                if snapshot is None or snapshot.version != version:
+                    snapshot = self.snapshot = self.build(version)
+        return snapshot
+
+    def response(self, request):
+        snapshot = self.get()
+        if_none_match = parse_etags(request.headers.get('If-None-Match', ''))
+        if snapshot.etag in if_none_match or '*' in if_none_match:
+            response = HttpResponseNotModified()
+        elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+            response = HttpResponse(
+                snapshot.gzipped, content_type='application/json'
+            )
+            response['Content-Encoding'] = 'gzip'
+        else:
+            response = HttpResponse(
+                snapshot.content, content_type='application/json'
+            )
+        response['ETag'] = snapshot.etag
+        patch_vary_headers(response, ('Accept-Encoding',))
+        patch_cache_control(response, no_cache=True)
+        return response
@@ -0,0 +1,362 @@
+import io
+import json
+import shutil
+import tempfile
+from contextlib import ExitStack
+from unittest import skipUnless
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.test import (RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+
+from api.flat_serializers import FlatRecipeSerializer
+from api.serializers import RecipeReadSerializer
+from foodgram import constants as c
+from foodgram.replicas import (ReplicaMiddleware, ReplicaRouter, primary_reads,
+                               read_database)
+from recipes.cache import get_version
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTags, ShoppingList, Tag)
+from users.models import Follow, User
+
+MEDIA_ROOT = tempfile.mkdtemp()
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, CACHES=CACHES, JOBS_EAGER=False)
+class SeededTestCase(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command(
+            'seed',
+            users=10,
+            recipes=60,
+            follows=30,
+            favorites=40,
+            carts=40,
+            stdout=io.StringIO(),
+        )
+        cls.user = User.objects.order_by('id').first()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # Cached pages and fragments would hide the queries.
+        cache.clear()
+        self.anonymous = APIClient()
+        self.authorized = APIClient()
+        self.authorized.force_authenticate(self.user)
+
+
+class RecipeListQueriesTest(SeededTestCase):
+
+    def assert_list_queries(self, client, queries):
+        for limit in (6, 50):
+            cache.clear()
+            with self.subTest(limit=limit), self.assertNumQueries(queries):
+                response = client.get(
+                    reverse('api:recipes-list'), {'limit': limit}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), limit)
+
+    def test_anonymous_list_queries_do_not_grow_with_page_size(self):
+        self.assert_list_queries(self.anonymous, 6)
+
+    def test_authorized_list_queries_do_not_grow_with_page_size(self):
+        self.assert_list_queries(self.authorized, 7)
+
+
+class FlatRecipeSerializerTest(SeededTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        author = User.objects.exclude(pk=cls.user.pk).order_by('id').first()
+        # Rows stored out of id order and an image without variants.
+        cls.recipe = Recipe.objects.create(
+            author=author,
+            name='Contract',
+            text='Checked against RecipeReadSerializer.',
+            cooking_time=5,
+            image='recipes/images/no-variants.png',
+        )
+        RecipeTags.objects.bulk_create(
+            RecipeTags(recipe=cls.recipe, tag=tag)
+            for tag in Tag.objects.order_by('-id')[:3]
+        )
+        RecipeIngredient.objects.bulk_create(
+            RecipeIngredient(recipe=cls.recipe, ingredient=ingredient,
+                             amount=amount)
+            for amount, ingredient in enumerate(
+                Ingredient.objects.order_by('-id')[:3], 1
+            )
+        )
+        Favorite.objects.create(user=cls.user, recipe=cls.recipe)
+        ShoppingList.objects.create(user=cls.user, recipe=cls.recipe)
+        Follow.objects.get_or_create(user=cls.user, author=author)
+
+    def render(self, user):
+        renderer = JSONRenderer()
+        request = APIRequestFactory().get(reverse('api:recipes-list'))
+        request.user = user
+        recipes = Recipe.objects.with_related().with_user_flags(user)
+        drf = renderer.render(RecipeReadSerializer(
+            recipes, many=True, context={'request': request}
+        ).data)
+        flat = []
+        for _ in range(2):
+            # Built from the database first, then from cached fragments.
+            serializer = FlatRecipeSerializer(request)
+            flat.append(renderer.render(
+                serializer.serialize(serializer.values(recipes))
+            ))
+        return drf, flat
+
+    def assert_identical(self, user):
+        drf, flat = self.render(user)
+        self.assertEqual(flat[0], drf)
+        self.assertEqual(flat[1], drf)
+        return json.loads(drf)
+
+    def test_anonymous_output_is_identical(self):
+        data = self.assert_identical(AnonymousUser())
+        self.assertTrue(any(recipe['image_variants'] for recipe in data))
+
+    def test_authorized_output_is_identical(self):
+        data = self.assert_identical(self.user)
+        recipe = next(
+            recipe for recipe in data if recipe['id'] == self.recipe.pk
+        )
+        self.assertTrue(recipe['is_favorited'])
+        self.assertTrue(recipe['is_in_shopping_cart'])
+        self.assertTrue(recipe['author']['is_subscribed'])
+        self.assertIsNone(recipe['image_variants'])
+        self.assertEqual(len(recipe['tags']), 3)
+        self.assertEqual(len(recipe['ingredients']), 3)
+
+
+class ShoppingCartDownloadTest(SeededTestCase):
+
+    def test_errors_are_rendered_as_json(self):
+        url = reverse('api:recipes-download_shopping_cart')
+        for client, params, status_code in (
+            (self.anonymous, {}, 401),
+            (self.authorized, {'format': 'docx'}, 404),
+        ):
+            with self.subTest(status_code=status_code):
+                response = client.get(url, params)
+                self.assertEqual(response.status_code, status_code)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                self.assertIn('detail', response.json())
+
+    def test_download_streams_the_requested_format(self):
+        response = self.authorized.get(
+            reverse('api:recipes-download_shopping_cart'), {'format': 'csv'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        content = b''.join(response.streaming_content).decode()
+        self.assertTrue(content.startswith('name,measurement_unit,amount'))
+
+
+class RecipeIngredientsVersionTest(SeededTestCase):
+
+    def patch(self, recipe, amount_delta):
+        self.authorized.force_authenticate(recipe.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.authorized.patch(
+                reverse('api:recipes-detail', args=[recipe.pk]),
+                {
+                    'name': 'Renamed',
+                    'tags': list(recipe.tags.values_list('id', flat=True)),
+                    'ingredients': [
+                        {'id': item.ingredient_id,
+                         'amount': item.amount + amount_delta}
+                        for item in recipe.ingredient_list.all()
+                    ],
+                },
+                format='json',
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_only_ingredient_changes_bump_the_version(self):
+        recipe = Recipe.objects.filter(ingredient_list__isnull=False).first()
+        version = get_version(c.RECIPE_INGREDIENTS_VERSION)
+        self.patch(recipe, 0)
+        self.assertEqual(get_version(c.RECIPE_INGREDIENTS_VERSION), version)
+        self.patch(recipe, 1)
+        self.assertNotEqual(
+            get_version(c.RECIPE_INGREDIENTS_VERSION), version
+        )
+
+
+class RecipeDeleteQueriesTest(SeededTestCase):
+
+    def test_delete_queries_do_not_grow_with_favorites(self):
+        recipe = Recipe.objects.filter(author=self.user).first()
+        users = User.objects.exclude(pk=self.user.pk)
+        for model in (Favorite, ShoppingList):
+            model.objects.bulk_create(
+                (model(user=user, recipe=recipe) for user in users),
+                ignore_conflicts=True,
+            )
+        # Favorites and cart rows are removed with their recipe without
+        # one counter update each.
+        with self.assertNumQueries(12):
+            response = self.authorized.delete(
+                reverse('api:recipes-detail', args=[recipe.pk])
+            )
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(Recipe.objects.filter(pk=recipe.pk).exists())
+
+
+class ShortLinkTest(SeededTestCase):
+
+    def test_unknown_code_is_not_found_from_cache(self):
+        url = reverse('short_url', args=['Missing'])
+        self.assertEqual(self.anonymous.get(url).status_code, 404)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.anonymous.get(url).status_code, 404)
+
+    def test_legacy_recipe_id_redirects(self):
+        recipe = Recipe.objects.first()
+        response = self.anonymous.get(reverse('short_url', args=[recipe.pk]))
+        self.assertRedirects(
+            response, f'/recipes/{recipe.pk}/', fetch_redirect_response=False
+        )
+
+    def test_new_link_redirects(self):
+        recipe = Recipe.objects.first()
+        link = self.anonymous.get(
+            reverse('api:recipes-get-link', args=[recipe.pk])
+        ).data['short-link']
+        code = link.rstrip('/').rsplit('/', 1)[-1]
+        self.assertFalse(code.isdigit())
+        response = self.anonymous.get(reverse('short_url', args=[code]))
+        self.assertRedirects(
+            response, f'/recipes/{recipe.pk}/', fetch_redirect_response=False
+        )
+
+
+@override_settings(DATABASE_REPLICAS=['replica_1'])
+class ReplicaMiddlewareTest(SimpleTestCase):
+
+    def route(self, request, status_code=200, forced=False):
+        databases = []
+
+        def get_response(request):
+            if forced:
+                with primary_reads():
+                    databases.append(ReplicaRouter().db_for_read(Recipe))
+            else:
+                databases.append(ReplicaRouter().db_for_read(Recipe))
+            return HttpResponse(status=status_code)
+
+        response = ReplicaMiddleware(get_response)(request)
+        self.assertIsNone(read_database.get())
+        return databases[0], c.REPLICA_STICKY_COOKIE in response.cookies
+
+    def test_safe_api_reads_use_the_replica(self):
+        self.assertEqual(
+            self.route(RequestFactory().get('/api/recipes/')),
+            ('replica_1', False),
+        )
+
+    def test_reads_outside_the_api_use_the_primary(self):
+        self.assertEqual(
+            self.route(RequestFactory().get('/admin/')),
+            (DEFAULT_DB_ALIAS, False),
+        )
+
+    def test_writes_use_the_primary_and_stick(self):
+        self.assertEqual(
+            self.route(RequestFactory().post('/api/recipes/'), 201),
+            (DEFAULT_DB_ALIAS, True),
+        )
+        self.assertEqual(
+            self.route(RequestFactory().post('/api/recipes/'), 400),
+            (DEFAULT_DB_ALIAS, False),
+        )
+
+    def test_reads_after_a_write_use_the_primary(self):
+        factory = RequestFactory()
+        factory.cookies[c.REPLICA_STICKY_COOKIE] = '1'
+        self.assertEqual(
+            self.route(factory.get('/api/recipes/')),
+            (DEFAULT_DB_ALIAS, False),
+        )
+
+    def test_primary_reads_forces_the_primary(self):
+        self.assertEqual(
+            self.route(RequestFactory().get('/api/recipes/'), forced=True),
+            (DEFAULT_DB_ALIAS, False),
+        )
+
+
+@skipUnless(settings.DATABASE_REPLICAS, 'No replica databases configured.')
+@override_settings(CACHES=CACHES)
+class ReplicaRoutingTest(TransactionTestCase):
+    """Run alone with ``DB_REPLICA_HOSTS`` set, see the CI workflow.
+
+    Replicas then mirror the test database. The other tests expect every
+    query on the primary.
+    """
+
+    databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+
+    def setUp(self):
+        cache.clear()
+        self.tag = Tag.objects.create(name='Replica', slug='replica')
+        user, self.author = (
+            User.objects.create_user(
+                username=name, email=f'{name}@example.com', password=name,
+                first_name=name, last_name=name,
+            )
+            for name in ('reader', 'author')
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+
+    def request(self, method, url):
+        with ExitStack() as stack:
+            captured = {
+                alias: stack.enter_context(
+                    CaptureQueriesContext(connections[alias])
+                )
+                for alias in self.databases
+            }
+            response = getattr(self.client, method)(url)
+        primary = len(captured.pop(DEFAULT_DB_ALIAS))
+        return response, primary, sum(map(len, captured.values()))
+
+    def test_reads_use_the_replica_until_a_write(self):
+        url = reverse('api:tags-detail', args=[self.tag.pk])
+        response, primary, replica = self.request('get', url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((primary, bool(replica)), (0, True))
+        response, primary, replica = self.request('post', reverse(
+            'api:users-subscribe', args=[self.author.pk]
+        ))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((bool(primary), replica), (True, 0))
+        response, primary, replica = self.request('get', url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((bool(primary), replica), (True, 0))
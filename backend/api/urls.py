@@ -1,19 +1,35 @@
+from django.conf import settings
 from django.urls import include, path
 from django.views.generic import TemplateView
 from rest_framework.routers import DefaultRouter
 
-from api.views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
-                       TagViewSet)
+from api import async_views
+from api.views import (CustomUserViewSet, IngredientViewSet, JobViewSet,
+                       RecipeViewSet, TagViewSet)
 
 app_name = 'api'
 
 router = DefaultRouter()
 router.register('ingredients', IngredientViewSet, 'ingredients')
+router.register('jobs', JobViewSet, 'jobs')
 router.register('recipes', RecipeViewSet, 'recipes')
 router.register('tags', TagViewSet, 'tags')
 router.register('users', CustomUserViewSet, 'users')
 
-urlpatterns = [
+urlpatterns = []
+
+if settings.ASYNC_TOGGLES:
+    # Shadow the synchronous viewset actions with the same names.
+    urlpatterns += [
+        path('recipes/<int:pk>/favorite/', async_views.favorite,
+             name='recipes-favorite'),
+        path('recipes/<int:pk>/shopping_cart/', async_views.shopping_cart,
+             name='recipes-shopping_cart'),
+        path('users/<int:id>/subscribe/', async_views.subscribe,
+             name='users-subscribe'),
+    ]
+
+urlpatterns += [
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('docs/', TemplateView.as_view(template_name='docs/redoc.html'),
@@ -1,8 +1,15 @@
+import hashlib
+from functools import partial
+
 from django.contrib.auth import get_user_model
-from django.core.exceptions import ValidationError
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.core.cache import cache
+from django.db.models import Max, Prefetch
+from django.http import Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect
+from django.urls import reverse as django_reverse
+from django.utils.cache import (get_conditional_response, patch_cache_control,
+                                patch_vary_headers)
+from django.utils.http import http_date, quote_etag
 from django.views.decorators.http import require_GET
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
@@ -10,19 +17,34 @@ from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
+from rest_framework.renderers import JSONRenderer
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 
+from api import shopping_cart
 from api.filters import IngredientFilter, RecipeFilter
+from api.flat_serializers import FlatRecipeSerializer
+from api.page_cache import recipe_page_cache
 from api.pagination import CustomLimitPagination
 from api.permissions import IsAdminAuthorOrReadOnly
+from api.renderers import SHOPPING_CART_RENDERERS
 from api.serializers import (AvatarSerializer, CustomUserSerializer,
                              FavoriteRecipeSerializer, IngredientSerializer,
-                             RecipeReadSerializer, RecipeWriteSerializer,
-                             SubscriberDetailSerializer, SubscriberSerializer,
-                             TagSerializer)
-from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
-                            ShoppingList, Tag)
+                             JobSerializer, RecipeReadSerializer,
+                             RecipeWriteSerializer, SubscriberDetailSerializer,
+                             SubscriberSerializer, TagSerializer,
+                             get_recipes_limit)
+from api.snapshots import ReferenceSnapshot
+from foodgram import constants as c
+from foodgram.images import delete_variants
+from foodgram.metrics import serializing
+from jobs.models import Job
+from jobs.queue import enqueue
+from recipes.cache import (get_recipes_deleted_at, get_version,
+                           user_flags_version_name)
+from recipes.ingredient_index import ingredient_index
+from recipes.models import Favorite, Ingredient, Recipe, ShoppingList, Tag
+from recipes.short_links import get_short_link, short_link_cache
 from users.models import Follow
 
 User = get_user_model()
@@ -57,6 +79,7 @@ class CustomUserViewSet(UserViewSet):
     @avatar.mapping.delete
     def delete_avatar(self, request, *args, **kwargs):
         user = self.request.user
+        delete_variants(user.avatar, c.AVATAR_VARIANTS)
         user.avatar.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -69,7 +92,13 @@ class CustomUserViewSet(UserViewSet):
     )
     def subscriptions(self, request):
         user = request.user
-        queryset = user.follower.all()
+        queryset = user.follower.select_related('author').prefetch_related(
+            Prefetch(
+                'author__recipes',
+                queryset=Recipe.objects.all()[:get_recipes_limit(request)],
+                to_attr='latest_recipes',
+            )
+        )
         pages = self.paginate_queryset(queryset)
         serializer = SubscriberDetailSerializer(
             pages,
@@ -121,11 +150,26 @@ class CustomUserViewSet(UserViewSet):
             return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    permission_classes = (IsAuthenticated,)
+    serializer_class = JobSerializer
+    pagination_class = CustomLimitPagination
+
+    def get_queryset(self):
+        return Job.objects.filter(user=self.request.user)
+
+
 class TagViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = (IsAdminAuthorOrReadOnly,)
     pagination_class = None
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    snapshot = ReferenceSnapshot(queryset, TagSerializer, c.TAGS_VERSION)
+
+    def list(self, request, *args, **kwargs):
+        if request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        return self.snapshot.response(request)
 
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
@@ -135,6 +179,24 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
     search_fields = ('^name',)
+    snapshot = ReferenceSnapshot(
+        queryset, IngredientSerializer, c.INGREDIENTS_VERSION
+    )
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if not name:
+            if request.accepted_renderer.format != 'json':
+                return super().list(request, *args, **kwargs)
+            return self.snapshot.response(request)
+        try:
+            limit = int(
+                request.query_params.get('limit', c.INGREDIENT_SEARCH_LIMIT)
+            )
+        except ValueError:
+            limit = c.INGREDIENT_SEARCH_LIMIT
+        limit = min(max(limit, 1), c.INGREDIENT_SEARCH_MAX_LIMIT)
+        return Response(ingredient_index.search(name, limit))
 
 
 class RecipeViewSet(viewsets.ModelViewSet):
@@ -144,6 +206,67 @@ class RecipeViewSet(viewsets.ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    def get_queryset(self):
+        return Recipe.objects.with_related().with_user_flags(
+            self.request.user
+        )
+
+    def get_validators(self, queryset):
+        last_modified = queryset.aggregate(
+            last_modified=Max('updated_at')
+        )['last_modified']
+        if last_modified is None:
+            return None, None
+        deleted_at = get_recipes_deleted_at()
+        if self.action == 'list' and deleted_at:
+            last_modified = max(last_modified, deleted_at)
+        parts = [self.request.get_full_path(), last_modified.isoformat()]
+        user = self.request.user
+        if not user.is_authenticated:
+            return parts, last_modified
+        parts += [user.id, get_version(user_flags_version_name(user.id))]
+        return parts, None
+
+    def conditional_response(self, request, queryset, get_response):
+        parts, last_modified = self.get_validators(queryset)
+        if parts is None:
+            return get_response()
+        etag = quote_etag(hashlib.md5(repr(parts).encode()).hexdigest())
+        last_modified = last_modified and int(last_modified.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        ) or get_response()
+        response['ETag'] = etag
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        patch_vary_headers(response, ('Authorization',))
+        patch_cache_control(response, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return recipe_page_cache.response(request, partial(
+            self.conditional_response,
+            request,
+            Recipe.objects.all(),
+            partial(self.flat_list, request),
+        ))
+
+    def flat_list(self, request):
+        serializer = FlatRecipeSerializer(request)
+        queryset = serializer.values(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        with serializing():
+            data = serializer.serialize(page)
+        return self.get_paginated_response(data)
+
+    def retrieve(self, request, *args, **kwargs):
+        return recipe_page_cache.response(request, partial(
+            self.conditional_response,
+            request,
+            Recipe.objects.filter(pk=kwargs['pk']),
+            partial(super().retrieve, request, *args, **kwargs),
+        ))
+
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve', 'get-link'):
             return RecipeReadSerializer
@@ -158,7 +281,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
     )
     def get_link(self, request, pk=None):
         recipe = get_object_or_404(Recipe, pk=pk)
-        rev_link = reverse('short_url', args=[recipe.pk])
+        rev_link = reverse('short_url', args=[get_short_link(recipe).code])
         return Response({'short-link': request.build_absolute_uri(rev_link)},
                         status=status.HTTP_200_OK,)
 
@@ -196,30 +319,58 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST,
             )
 
-    @staticmethod
-    def shopping_list_to_txt(ingredients):
-        return '\n'.join(
-            f'{ingredient["ingredient__name"]} - {ingredient["sum"]} '
-            f'({ingredient["ingredient__measurement_unit"]})'
-            for ingredient in ingredients
-        )
+    def finalize_response(self, request, response, *args, **kwargs):
+        if (
+            self.action == 'download_shopping_cart'
+            and getattr(response, 'exception', False)
+        ):
+            # Shopping cart renderers only stream files, errors stay JSON.
+            request.accepted_renderer = JSONRenderer()
+            request.accepted_media_type = JSONRenderer.media_type
+        return super().finalize_response(request, response, *args, **kwargs)
 
     @action(
         detail=False,
         methods=['GET'],
         permission_classes=[IsAuthenticated],
+        renderer_classes=SHOPPING_CART_RENDERERS,
         url_path='download_shopping_cart',
         url_name='download_shopping_cart',
     )
     def download_shopping_cart(self, request):
-        ingredients = (
-            RecipeIngredient.objects.filter(
-                recipe__shopping_list__user=request.user)
-            .values('ingredient__name', 'ingredient__measurement_unit')
-            .annotate(sum=Sum('amount'))
+        renderer = request.accepted_renderer
+        cache_key = shopping_cart.get_cache_key(
+            request.user.id, renderer.format
+        )
+        content = cache.get(cache_key)
+        if content is not None:
+            response = HttpResponse(content)
+        elif 'respond-async' in request.headers.get('Prefer', ''):
+            job = enqueue(
+                shopping_cart.render_shopping_cart,
+                request.user.id,
+                renderer.format,
+                user=request.user,
+            )
+            return Response(
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Location': request.build_absolute_uri(
+                    django_reverse('api:jobs-detail', args=[job.pk])
+                )},
+            )
+        else:
+            ingredients = shopping_cart.get_ingredients(request.user.id)
+            response = StreamingHttpResponse(shopping_cart.stream_and_cache(
+                renderer.stream(ingredients), cache_key
+            ))
+        response['Content-Type'] = renderer.media_type
+        if renderer.charset:
+            response['Content-Type'] += f'; charset={renderer.charset}'
+        response['Content-Disposition'] = (
+            'attachment; '
+            f'filename="{c.SHOPPING_CART_FILENAME}.{renderer.format}"'
         )
-        shopping_list = self.shopping_list_to_txt(ingredients)
-        return HttpResponse(shopping_list, content_type='text/plain')
+        return response
 
     @action(
         detail=True,
@@ -256,9 +407,8 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
 
 @require_GET
-def short_url(request, pk):
-    try:
-        Recipe.objects.filter(pk=pk).exists()
-        return redirect(f'/recipes/{pk}/')
-    except Exception:
-        raise ValidationError(f'Recipe "{pk}" does not exist.')
+def short_url(request, code):
+    recipe_id = short_link_cache.resolve(code)
+    if recipe_id is None:
+        raise Http404(f'Short link "{code}" does not exist.')
+    return redirect(f'/recipes/{recipe_id}/')
@@ -7,6 +7,7 @@ LAST_NAME_MAX_LENGTH = 150
 PASSWORD_MAX_LENGTH = 150
 TAG_NAME_MAX_LENGTH = 32
 TAG_SLUG_MAX_LENGTH = 32
+TAG_MASK_BITS = 63
 RECIPE_NAME_MAX_LENGTH = 256
 COOKING_TIME_MIN = 1
 INGREDIENT_NAME_MAX_LENGTH = 128
@@ -14,3 +15,61 @@ MEASUREMENT_UNIT_MAX_LENGTH = 64
 INGREDIENT_AMOUNT_MIN = 1
 FULL_URL_MAX_LENGTH = 256
 SHORT_URL_MAX_LENGTH = 100
+IMAGE_NAME_MAX_LENGTH = 100
+SHORT_LINK_CODE_LENGTH = 6
+SHORT_LINK_CREATE_ATTEMPTS = 5
+SHORT_LINK_CACHE_SIZE = 10000
+SHORT_LINKS_VERSION = 'short_links'
+RECIPE_INGREDIENTS_VERSION = 'recipe_ingredients'
+SHOPPING_CART_FILENAME = 'shopping_list'
+SHOPPING_CART_CHUNK_SIZE = 2000
+SHOPPING_CART_CACHE_TIMEOUT = 60 * 60 * 24
+SHOPPING_CART_PDF_FONT_SIZE = 18
+SHOPPING_CART_PDF_PAGE_SIZE = (1240, 1754)
+SHOPPING_CART_PDF_MARGIN = 100
+SHOPPING_CART_PDF_RESOLUTION = 150
+INGREDIENTS_VERSION = 'ingredients'
+INGREDIENT_SEARCH_LIMIT = 20
+INGREDIENT_SEARCH_MAX_LIMIT = 100
+TAGS_VERSION = 'tags'
+IMPORT_BATCH_SIZE = 5000
+RECIPE_IMAGE_VARIANTS = {'thumbnail': 200, 'card': 600, 'full': 1200}
+AVATAR_VARIANTS = {'thumbnail': 64, 'card': 200}
+JOB_NAME_MAX_LENGTH = 255
+JOB_STATUS_MAX_LENGTH = 16
+JOB_WORKER_MAX_LENGTH = 128
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BACKOFF = 5
+JOB_LOCK_TIMEOUT = 60 * 10
+JOB_POLL_INTERVAL = 1
+JOB_WORKERS = 2
+SEARCH_CONFIG = 'russian'
+BENCHMARK_USERS = 50
+BENCHMARK_RECIPES = 500
+BENCHMARK_FAVORITES = 20
+BENCHMARK_FOLLOWS = 10
+BENCHMARK_ITERATIONS = 20
+BENCHMARK_WARMUP = 2
+BENCHMARK_LATENCY_HEADROOM = 3
+BENCHMARK_MIN_LATENCY_BUDGET = 25
+BENCHMARK_SERIALIZER_ROWS = 100
+TOGGLE_BENCHMARK_USERS = 20
+TOGGLE_BENCHMARK_ROUNDS = 25
+SEED_USERS = 1000
+SEED_RECIPES = 10000
+SEED_FOLLOWS = 10000
+SEED_FAVORITES = 100000
+SEED_CARTS = 20000
+SEED_INGREDIENTS = 2000
+SEED_TAGS_PER_RECIPE = 3
+SEED_INGREDIENTS_PER_RECIPE = (3, 12)
+SEED_BATCH_SIZE = 10000
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+METRICS_FLUSH_INTERVAL = 1
+AUTH_TOKEN_CACHE_TIMEOUT = 60
+AUTH_TOKEN_CACHE_SIZE = 10000
+RECIPE_CATALOG_VERSION = 'recipe_catalog'
+RECIPE_PAGE_CACHE_TIMEOUT = 60
+RECIPE_FRAGMENT_CACHE_TIMEOUT = 60 * 60 * 24
+REPLICA_READ_PATH = '/api/'
+REPLICA_STICKY_COOKIE = 'primary_reads'
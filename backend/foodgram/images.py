@@ -0,0 +1,125 @@
+import io
+import os
+
+from django.apps import apps
+from django.core.files.base import ContentFile
+from django.dispatch import Signal
+from PIL import Image, ImageOps
+
+VARIANT_FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+# Sent with the model instance once the variants of its image are saved.
+variants_created = Signal()
+
+
+def variant_name(name, variant, extension):
+    return f'{os.path.splitext(name)[0]}.{variant}.{extension}'
+
+
+def variant_names(name, variants):
+    return {
+        variant: {
+            extension: variant_name(name, variant, extension)
+            for extension in VARIANT_FORMATS
+        }
+        for variant in variants
+    }
+
+
+def encode(image, extension):
+    image_format, options = VARIANT_FORMATS[extension]
+    if image_format == 'JPEG' and image.mode == 'RGBA':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def variants_exist(field_file, variants):
+    return all(
+        field_file.storage.exists(name)
+        for formats in variant_names(field_file.name, variants).values()
+        for name in formats.values()
+    )
+
+
+def recorded_field_name(field):
+    """Model field holding the image name whose variants were created."""
+    return f'{field.name}_variants_of'
+
+
+def has_variants(field_file):
+    return bool(field_file) and getattr(
+        field_file.instance, recorded_field_name(field_file.field), None
+    ) == field_file.name
+
+
+def record_variants(field_file):
+    """Store the image name on the instance once its variants exist."""
+    instance = field_file.instance
+    if instance is None or instance.pk is None or has_variants(field_file):
+        return
+    recorded = recorded_field_name(field_file.field)
+    # Skipped when the image was replaced while the variants were made.
+    if type(instance)._base_manager.filter(
+            pk=instance.pk, **{field_file.field.name: field_file.name}
+    ).update(**{recorded: field_file.name}):
+        setattr(instance, recorded, field_file.name)
+        variants_created.send(
+            sender=type(instance), instance=instance, field=field_file.field
+        )
+
+
+def create_variants(field_file, variants, overwrite=False):
+    """Save resized WebP and JPEG copies next to the original image."""
+    if not field_file:
+        return
+    if overwrite or not variants_exist(field_file, variants):
+        storage = field_file.storage
+        names = variant_names(field_file.name, variants)
+        with field_file.open('rb') as file, Image.open(file) as original:
+            mode = 'RGBA' if original.has_transparency_data else 'RGB'
+            original = ImageOps.exif_transpose(original).convert(mode)
+            for variant, size in variants.items():
+                image = original.copy()
+                image.thumbnail((size, size), Image.Resampling.LANCZOS)
+                for extension, name in names[variant].items():
+                    if storage.exists(name):
+                        storage.delete(name)
+                    storage.save(name, ContentFile(encode(image, extension)))
+    record_variants(field_file)
+
+
+def create_model_variants(model_label, pk, field, variants):
+    instance = apps.get_model(model_label).objects.filter(pk=pk).first()
+    if instance is not None:
+        create_variants(getattr(instance, field), variants)
+
+
+def delete_variants(field_file, variants):
+    if not field_file:
+        return
+    for formats in variant_names(field_file.name, variants).values():
+        for name in formats.values():
+            field_file.storage.delete(name)
+
+
+def variant_urls(field_file, variants, build_absolute_uri=None):
+    """Urls of the variants, ``None`` until they are recorded as created."""
+    if not has_variants(field_file):
+        return None
+    build_absolute_uri = build_absolute_uri or (lambda url: url)
+    return {
+        variant: {
+            extension: build_absolute_uri(field_file.storage.url(name))
+            for extension, name in formats.items()
+        }
+        for variant, formats in variant_names(
+            field_file.name, variants
+        ).items()
+    }
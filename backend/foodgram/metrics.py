@@ -0,0 +1,413 @@
+import fcntl
+import glob
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+
+from foodgram import constants as c
+
+UNMATCHED_ROUTE = '<unmatched>'
+RETIRED_FILE = 'retired.json'
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Timings exported as histograms, by the name of their metric.
+HISTOGRAMS = {
+    'total': ('request_duration_seconds', 'Time spent in Django.'),
+    'serialize': (
+        'serialize_duration_seconds', 'Time spent in serializers outside SQL.'
+    ),
+}
+
+# Context variables follow a request into the threads that sync_to_async
+# runs ORM calls in, unlike connections, which are per thread.
+current_timer = ContextVar('current_timer', default=None)
+
+
+class RequestTimer:
+    """Timings of a single request, filled in by ``MetricsMiddleware``."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view_started = None
+        self.view_finished = None
+        self.render_finished = None
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.serializing = False
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    def timings(self, finished):
+        view_started = self.view_started or self.started
+        view_finished = self.view_finished or finished
+        render = 0.0
+        if self.render_finished is not None:
+            render = self.render_finished - view_finished
+        return {
+            'db': self.db,
+            'serialize': self.serialize,
+            'view': max(
+                view_finished - view_started - self.db - self.serialize, 0.0
+            ),
+            'render': render,
+            'total': finished - self.started,
+        }
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer.execute(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_execute_wrapper(sender, connection, **kwargs):
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+@contextmanager
+def serializing():
+    """Count the time of the block, SQL excluded, as serialization."""
+    timer = current_timer.get()
+    if timer is None or timer.serializing:
+        # Serializers used inside another one are already being timed.
+        yield
+        return
+    timer.serializing = True
+    started = time.perf_counter()
+    db = timer.db
+    try:
+        yield
+    finally:
+        timer.serializing = False
+        timer.serialize += time.perf_counter() - started - (timer.db - db)
+
+
+class MetricsRegistry:
+    """Per-process request aggregates, periodically written to a file.
+
+    Every worker process owns one JSON file in ``settings.METRICS_DIR``,
+    named by a random id, and replaces it atomically, so workers never
+    contend for a lock; the metrics view sums all files. Files of exited
+    workers are merged into one retired file, which keeps the exported
+    counters monotonic without letting the directory grow.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+        self.flushed = 0.0
+        self.pid = None
+        self.path = None
+
+    def observe(self, route, method, status, timings, queries):
+        key = f'{method} {route}'
+        with self.lock:
+            entry = self.routes.get(key)
+            if entry is None:
+                entry = self.routes[key] = {
+                    'route': route,
+                    'method': method,
+                    'count': 0,
+                    **{
+                        f'{name}_buckets': [0] * (len(c.METRICS_BUCKETS) + 1)
+                        for name in HISTOGRAMS
+                    },
+                    'queries': 0,
+                    'statuses': {},
+                    **{f'{name}_sum': 0.0 for name in timings},
+                }
+            entry['count'] += 1
+            entry['queries'] += queries
+            for name, value in timings.items():
+                entry[f'{name}_sum'] += value
+            for name in HISTOGRAMS:
+                position = len(c.METRICS_BUCKETS)
+                for number, bound in enumerate(c.METRICS_BUCKETS):
+                    if timings[name] <= bound:
+                        position = number
+                        break
+                entry[f'{name}_buckets'][position] += 1
+            status_class = f'{status // 100}xx'
+            entry['statuses'][status_class] = (
+                entry['statuses'].get(status_class, 0) + 1
+            )
+        if time.monotonic() - self.flushed >= c.METRICS_FLUSH_INTERVAL:
+            try:
+                self.flush()
+            except OSError:
+                # Losing a flush must never fail the request itself.
+                pass
+
+    def flush(self):
+        with self.lock:
+            if self.pid != os.getpid():
+                # A forked worker must not overwrite the file of its parent.
+                if self.pid is not None:
+                    self.routes = {}
+                self.pid = os.getpid()
+                self.path = os.path.join(
+                    settings.METRICS_DIR, f'worker-{uuid.uuid4().hex}.json'
+                )
+            data = json.dumps({
+                'host': socket.gethostname(),
+                'pid': self.pid,
+                'routes': self.routes,
+            })
+            path = self.path
+            self.flushed = time.monotonic()
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        write_json(path, data)
+
+
+registry = MetricsRegistry()
+
+
+def write_json(path, data):
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as file:
+        file.write(data)
+    os.replace(temporary, path)
+
+
+def read_json(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def is_running(worker):
+    """Whether the process that wrote a worker file is still alive.
+
+    Processes of other hosts sharing the directory cannot be checked and
+    are taken as running.
+    """
+    if worker['host'] != socket.gethostname():
+        return True
+    try:
+        os.kill(worker['pid'], 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def merge_routes(routes, worker_routes):
+    for key, entry in worker_routes.items():
+        total = routes.setdefault(key, {
+            'route': entry['route'],
+            'method': entry['method'],
+            'statuses': {},
+        })
+        for name, value in entry.items():
+            if name.endswith('buckets'):
+                previous = total.get(name, [0] * len(value))
+                total[name] = [
+                    left + right for left, right in zip(previous, value)
+                ]
+            elif name == 'statuses':
+                for status, count in value.items():
+                    total[name][status] = total[name].get(status, 0) + count
+            elif name not in ('route', 'method'):
+                total[name] = total.get(name, 0) + value
+    return routes
+
+
+def retire_workers():
+    """Merge the files of exited workers into the retired file."""
+    retired_path = os.path.join(settings.METRICS_DIR, RETIRED_FILE)
+    lock_path = os.path.join(settings.METRICS_DIR, f'{RETIRED_FILE}.lock')
+    with open(lock_path, 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retired = read_json(retired_path) or {}
+        exited = []
+        for path in glob.glob(
+                os.path.join(settings.METRICS_DIR, 'worker-*.json')):
+            worker = read_json(path)
+            if worker is not None and not is_running(worker):
+                merge_routes(retired, worker['routes'])
+                exited.append(path)
+        if exited:
+            write_json(retired_path, json.dumps(retired))
+            for path in exited:
+                os.remove(path)
+
+
+def collect():
+    routes = merge_routes(
+        {}, read_json(os.path.join(settings.METRICS_DIR, RETIRED_FILE)) or {}
+    )
+    for path in glob.glob(os.path.join(settings.METRICS_DIR, 'worker-*.json')):
+        worker = read_json(path)
+        if worker is not None:
+            merge_routes(routes, worker['routes'])
+    return sorted(routes.values(), key=lambda entry: (
+        entry['route'], entry['method']
+    ))
+
+
+def labels(entry, **extra):
+    pairs = {'route': entry['route'], 'method': entry['method'], **extra}
+    return ','.join(
+        '{}="{}"'.format(
+            name, str(value).replace('\\', '\\\\').replace('"', '\\"')
+        )
+        for name, value in pairs.items()
+    )
+
+
+def render_prometheus(routes):
+    prefix = 'foodgram_http'
+    lines = []
+    for name, (metric, help_text) in HISTOGRAMS.items():
+        metric = f'{prefix}_{metric}'
+        lines.append(f'# HELP {metric} {help_text}')
+        lines.append(f'# TYPE {metric} histogram')
+        for entry in routes:
+            cumulative = 0
+            bounds = [*c.METRICS_BUCKETS, '+Inf']
+            for bound, count in zip(bounds, entry[f'{name}_buckets']):
+                cumulative += count
+                lines.append(
+                    f'{metric}_bucket{{{labels(entry, le=bound)}}} '
+                    f'{cumulative}'
+                )
+            lines.append(
+                f'{metric}_sum{{{labels(entry)}}} {entry[f"{name}_sum"]}'
+            )
+            lines.append(
+                f'{metric}_count{{{labels(entry)}}} {entry["count"]}'
+            )
+    for name, help_text in (
+        ('db', 'Time spent in SQL queries.'),
+        ('view', 'Time spent in views outside SQL and serializers.'),
+        ('render', 'Time spent rendering responses.'),
+    ):
+        lines.append(f'# HELP {prefix}_{name}_seconds_total {help_text}')
+        lines.append(f'# TYPE {prefix}_{name}_seconds_total counter')
+        lines.extend(
+            f'{prefix}_{name}_seconds_total{{{labels(entry)}}} '
+            f'{entry[f"{name}_sum"]}'
+            for entry in routes
+        )
+    lines.append(f'# HELP {prefix}_db_queries_total SQL queries executed.')
+    lines.append(f'# TYPE {prefix}_db_queries_total counter')
+    lines.extend(
+        f'{prefix}_db_queries_total{{{labels(entry)}}} {entry["queries"]}'
+        for entry in routes
+    )
+    lines.append(f'# HELP {prefix}_responses_total Responses by status.')
+    lines.append(f'# TYPE {prefix}_responses_total counter')
+    lines.extend(
+        f'{prefix}_responses_total{{{labels(entry, status=status)}}} {count}'
+        for entry in routes
+        for status, count in sorted(entry['statuses'].items())
+    )
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    try:
+        registry.flush()
+        retire_workers()
+    except OSError:
+        # The files of other workers can still be exported.
+        pass
+    return HttpResponse(
+        render_prometheus(collect()), content_type=PROMETHEUS_CONTENT_TYPE
+    )
+
+
+class MetricsMiddleware:
+    """Measure SQL, serializer, view and render time of every request.
+
+    The numbers are sent back in a ``Server-Timing`` header and added to
+    the per-route aggregates exported by ``metrics_view``. Works under
+    both WSGI and ASGI.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        for connection in connections.all(initialized_only=True):
+            install_execute_wrapper(None, connection)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = request.timer = RequestTimer()
+        token = current_timer.set(timer)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        timer = request.timer = RequestTimer()
+        token = current_timer.set(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timer.reset(token)
+        return self.finish(request, response)
+
+    def finish(self, request, response):
+        timer = request.timer
+        timings = timer.timings(time.perf_counter())
+        response['Server-Timing'] = ', '.join(
+            [f'db;dur={timings["db"] * 1000:.2f};desc="{timer.queries} '
+             f'queries"']
+            + [
+                f'{name};dur={timings[name] * 1000:.2f}'
+                for name in ('serialize', 'view', 'render', 'total')
+            ]
+        )
+        match = request.resolver_match
+        route = match.view_name if match else UNMATCHED_ROUTE
+        if route != 'metrics':
+            registry.observe(
+                route, request.method, response.status_code, timings,
+                timer.queries,
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.timer.view_started = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        timer = request.timer
+        timer.view_finished = time.perf_counter()
+
+        def rendered(response):
+            timer.render_finished = time.perf_counter()
+
+        response.add_post_render_callback(rendered)
+        return response
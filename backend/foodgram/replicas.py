@@ -0,0 +1,105 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+from foodgram import constants as c
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Alias of the replica serving reads of the current request, if any.
+read_database = ContextVar('read_database', default=None)
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary, e.g. to fill a cache keyed by a version.
+
+    A lagging replica could otherwise store data older than the version
+    it is cached under, and it would stay there until the next bump.
+    """
+    token = read_database.set(None)
+    try:
+        yield
+    finally:
+        read_database.reset(token)
+
+
+class ReplicaRouter:
+    """Reads go to the replica chosen by ``ReplicaMiddleware``.
+
+    Outside of such requests (writes, admin, management commands and
+    jobs) every query uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_database.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """Serve safe API requests from a random replica.
+
+    A successful write sets a cookie that keeps the client's reads on the
+    primary for ``REPLICA_STICKINESS`` seconds, so users see their own
+    changes even when the replicas lag behind.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = read_database.set(self.get_read_database(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            read_database.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = read_database.set(self.get_read_database(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            read_database.reset(token)
+        return self.finish(request, response)
+
+    def get_read_database(self, request):
+        if (not settings.DATABASE_REPLICAS
+                or request.method not in SAFE_METHODS
+                or not request.path.startswith(c.REPLICA_READ_PATH)
+                or c.REPLICA_STICKY_COOKIE in request.COOKIES):
+            return None
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def finish(self, request, response):
+        if (settings.DATABASE_REPLICAS
+                and request.method not in SAFE_METHODS
+                and response.status_code < 400):
+            response.set_cookie(
+                c.REPLICA_STICKY_COOKIE,
+                '1',
+                max_age=settings.REPLICA_STICKINESS,
+                httponly=True,
+                samesite='Lax',
+            )
+        return response
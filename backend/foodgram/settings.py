@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -26,6 +27,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework.authtoken',
     'djoser',
@@ -33,9 +35,12 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig',
     'users.apps.UsersConfig',
     'recipes.apps.RecipesConfig',
+    'jobs.apps.JobsConfig',
 ]
 
 MIDDLEWARE = [
+    'foodgram.metrics.MetricsMiddleware',
+    'foodgram.replicas.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -77,6 +82,36 @@ DATABASES = {
     }
 }
 
+# Comma separated hosts of read replicas of the default database.
+DATABASE_REPLICAS = []
+for number, host in enumerate(
+        filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), 1):
+    DATABASES[f'replica_{number}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica_{number}')
+
+DATABASE_ROUTERS = ['foodgram.replicas.ReplicaRouter']
+
+# Seconds a client keeps reading from the primary after a write.
+REPLICA_STICKINESS = int(os.getenv('DB_REPLICA_STICKINESS', 10))
+
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.filebased.FileBasedCache',
+        ),
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(BASE_DIR, 'cache'),
+        ),
+    }
+}
+
 
 AUTH_USER_MODEL = 'users.User'
 
@@ -122,7 +157,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -143,3 +178,21 @@ DJOSER = {
         'user_create': 'api.serializers.CustomUserCreateSerializer',
     }
 }
+
+
+SHOPPING_CART_PDF_FONT = os.getenv(
+    'SHOPPING_CART_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf',
+)
+
+
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False').lower() == 'true'
+
+# Set by the ASGI deployment profile, see gunicorn.conf.py.
+ASYNC_TOGGLES = os.getenv('ASYNC_TOGGLES', 'False').lower() == 'true'
+
+
+METRICS_DIR = os.getenv(
+    'METRICS_DIR',
+    os.path.join(tempfile.gettempdir(), 'foodgram-metrics'),
+)
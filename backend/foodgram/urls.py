@@ -4,11 +4,13 @@ from django.contrib import admin
 from django.urls import include, path
 
 from api.views import short_url
+from foodgram.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
-    path('s/<int:pk>/', short_url, name='short_url')
+    path('s/<str:code>/', short_url, name='short_url'),
+    path('metrics', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,12 @@
+import os
+
+bind = '0.0.0.0:9090'
+
+# SERVER_PROFILE=asgi runs foodgram.asgi on uvicorn workers and routes the
+# favorite, shopping cart and subscribe toggles to the async views.
+if os.getenv('SERVER_PROFILE', 'wsgi') == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    raw_env = ['ASYNC_TOGGLES=true']
+else:
+    wsgi_app = 'foodgram.wsgi:application'
@@ -0,0 +1,17 @@
+from django.contrib import admin
+
+from jobs.models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = (
+        'id', 'name', 'status', 'attempts', 'duration', 'created_at',
+    )
+    list_filter = ('status', 'name')
+    search_fields = ('name',)
+    readonly_fields = (
+        'attempts', 'created_at', 'started_at', 'finished_at', 'duration',
+        'worker', 'result', 'error',
+    )
+    empty_value_display = '-empty-'
@@ -0,0 +1,114 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+from django.db.models import Avg, Count, Max, Q
+
+from foodgram import constants as c
+from jobs.models import Job
+from jobs.queue import claim_job, run_job
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers backed by the database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=c.JOB_WORKERS,
+            help='Number of worker processes',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=c.JOB_POLL_INTERVAL,
+            help='Seconds to sleep when the queue is empty',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Exit as soon as the queue is empty',
+        )
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            help='Print per-job timing statistics and exit',
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            return self.print_stats()
+        processes = max(options['processes'], 1)
+        if processes == 1:
+            return self.work(options['poll_interval'], options['once'])
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        workers = [
+            context.Process(
+                target=self.work,
+                args=(options['poll_interval'], options['once']),
+            )
+            for _ in range(processes)
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f'Started {processes} workers.')
+
+        def stop(*args):
+            # Workers finish their current job before exiting.
+            for worker in workers:
+                worker.terminate()
+
+        signal.signal(signal.SIGTERM, stop)
+        try:
+            for worker in workers:
+                worker.join()
+        except KeyboardInterrupt:
+            stop()
+            for worker in workers:
+                worker.join()
+
+    def work(self, poll_interval, once):
+        name = f'{socket.gethostname()}:{os.getpid()}'
+        stopping = []
+        signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+        while not stopping:
+            try:
+                job = run_job(claim_job(name))
+            except DatabaseError as err:
+                self.stderr.write(f'[{name}] {err!r}')
+                connections.close_all()
+                time.sleep(poll_interval)
+                continue
+            if job is not None:
+                self.stdout.write(
+                    f'[{name}] {job} in {job.duration:.3f}s'
+                )
+                continue
+            if once:
+                break
+            time.sleep(poll_interval)
+
+    def print_stats(self):
+        stats = Job.objects.values('name').annotate(
+            total=Count('id'),
+            done=Count('id', filter=Q(status=Job.DONE)),
+            failed=Count('id', filter=Q(status=Job.FAILED)),
+            pending=Count(
+                'id', filter=Q(status__in=(Job.QUEUED, Job.RUNNING))
+            ),
+            avg=Avg('duration'),
+            max=Max('duration'),
+        ).order_by('name')
+        for row in stats:
+            self.stdout.write(
+                '{name}: {total} total, {done} done, {failed} failed, '
+                '{pending} pending, avg {avg:.3f}s, max {max:.3f}s'.format(
+                    **{**row, 'avg': row['avg'] or 0, 'max': row['max'] or 0}
+                )
+            )
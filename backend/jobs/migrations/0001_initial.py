@@ -0,0 +1,45 @@
+# Generated by Django 5.1.10 on 2026-10-18 06:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, verbose_name='Dotted path of the job function')),
+                ('args', models.JSONField(blank=True, default=list)),
+                ('kwargs', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=16, verbose_name='Status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Attempts made')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=5, verbose_name='Maximum attempts')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Not before')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Last attempt started')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Last attempt finished')),
+                ('duration', models.FloatField(blank=True, null=True, verbose_name='Last attempt duration, s')),
+                ('worker', models.CharField(blank=True, max_length=128, verbose_name='Worker')),
+                ('result', models.JSONField(blank=True, null=True)),
+                ('error', models.TextField(blank=True, verbose_name='Last error')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to=settings.AUTH_USER_MODEL, verbose_name='Job owner')),
+            ],
+            options={
+                'verbose_name': 'Job',
+                'verbose_name_plural': 'Jobs',
+                'ordering': ('-id',),
+                'indexes': [models.Index(fields=['status', 'run_at'], name='job_queue_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,88 @@
+from django.db import models
+from django.utils import timezone
+
+from foodgram import constants as c
+from users.models import User
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(
+        max_length=c.JOB_NAME_MAX_LENGTH,
+        verbose_name='Dotted path of the job function',
+    )
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    user = models.ForeignKey(
+        User,
+        null=True,
+        blank=True,
+        on_delete=models.CASCADE,
+        related_name='jobs',
+        verbose_name='Job owner',
+    )
+    status = models.CharField(
+        max_length=c.JOB_STATUS_MAX_LENGTH,
+        choices=STATUS_CHOICES,
+        default=QUEUED,
+        verbose_name='Status',
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Attempts made',
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=c.JOB_MAX_ATTEMPTS,
+        verbose_name='Maximum attempts',
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Not before',
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Created',
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Last attempt started',
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name='Last attempt finished',
+    )
+    duration = models.FloatField(
+        null=True,
+        blank=True,
+        verbose_name='Last attempt duration, s',
+    )
+    worker = models.CharField(
+        max_length=c.JOB_WORKER_MAX_LENGTH,
+        blank=True,
+        verbose_name='Worker',
+    )
+    result = models.JSONField(null=True, blank=True)
+    error = models.TextField(blank=True, verbose_name='Last error')
+
+    class Meta:
+        ordering = ('-id',)
+        verbose_name = 'Job'
+        verbose_name_plural = 'Jobs'
+        indexes = (
+            models.Index(fields=('status', 'run_at'), name='job_queue_idx'),
+        )
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
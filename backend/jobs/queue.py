@@ -0,0 +1,115 @@
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from foodgram import constants as c
+from jobs.models import Job
+
+
+def job_name(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+
+def enqueue(func, *args, user=None, delay=0, max_attempts=None,
+            unique=False, **kwargs):
+    """Store a call to ``func`` for a worker; arguments must be JSON.
+
+    With ``unique`` an identical call still waiting in the queue is
+    returned instead of storing another one.
+    """
+    if unique:
+        job = Job.objects.filter(
+            name=job_name(func), args=list(args), kwargs=kwargs,
+            status=Job.QUEUED,
+        ).first()
+        if job is not None:
+            return job
+    job = Job.objects.create(
+        name=job_name(func),
+        args=list(args),
+        kwargs=kwargs,
+        user=user,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or c.JOB_MAX_ATTEMPTS,
+    )
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: run_job(claim_job('eager', job.pk)))
+    return job
+
+
+def fail_lost_jobs(now):
+    """Fail jobs whose worker died during their last allowed attempt."""
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        started_at__lt=now - timedelta(seconds=c.JOB_LOCK_TIMEOUT),
+        attempts__gte=F('max_attempts'),
+    ).update(
+        status=Job.FAILED,
+        finished_at=now,
+        error='The worker was lost during the last attempt.',
+    )
+
+
+def claim_job(worker, pk=None):
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | Q(
+            status=Job.RUNNING,
+            started_at__lt=now - timedelta(seconds=c.JOB_LOCK_TIMEOUT),
+            attempts__lt=F('max_attempts'),
+        )
+    ).order_by('run_at', 'id')
+    if pk is not None:
+        candidates = candidates.filter(pk=pk)
+    else:
+        fail_lost_jobs(now)
+    with transaction.atomic():
+        job = candidates.select_for_update(skip_locked=True).first()
+        if job is None:
+            return None
+        claimed = Job.objects.filter(
+            pk=job.pk, status=job.status, attempts=job.attempts
+        ).update(
+            status=Job.RUNNING,
+            started_at=now,
+            worker=worker,
+            attempts=F('attempts') + 1,
+        )
+    if not claimed:
+        return None
+    job.refresh_from_db()
+    return job
+
+
+def run_job(job):
+    if job is None:
+        return None
+    started = time.monotonic()
+    try:
+        result = import_string(job.name)(*job.args, **job.kwargs)
+    except Exception:
+        job.error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + timedelta(
+                seconds=c.JOB_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+            )
+        else:
+            job.status = Job.FAILED
+    else:
+        job.status = Job.DONE
+        job.result = result
+        job.error = ''
+    job.duration = time.monotonic() - started
+    job.finished_at = timezone.now()
+    job.save(update_fields=(
+        'status', 'result', 'error', 'run_at', 'duration', 'finished_at',
+    ))
+    return job
@@ -1,11 +1,12 @@
 from django.contrib import admin
 
 from foodgram import constants as c
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.cache import bump_version_on_commit
+from recipes.models import Ingredient, Recipe, RecipeIngredient, ShortLink, Tag
 
 
 class RecipeIngredientsInLine(admin.TabularInline):
-    model = Recipe.ingredients.through
+    model = RecipeIngredient
     extra = c.INLINE_EXTRA
 
 
@@ -23,14 +24,38 @@ class IngredientAdmin(admin.ModelAdmin):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'text', 'author')
+    list_display = (
+        'id',
+        'name',
+        'text',
+        'author',
+        'favorites_count',
+        'in_carts_count',
+    )
     search_fields = ('name', 'author')
+    readonly_fields = ('favorites_count', 'in_carts_count')
     inlines = (RecipeIngredientsInLine, RecipeTagsInLine)
     empty_value_display = '-empty-'
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        Recipe.objects.filter(pk=form.instance.pk).update_tags_mask()
+        if any(
+            formset.model is RecipeIngredient and formset.has_changed()
+            for formset in formsets
+        ):
+            bump_version_on_commit(c.RECIPE_INGREDIENTS_VERSION)
+
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'slug')
+    list_display = ('id', 'name', 'slug', 'bit')
     search_fields = ('name',)
     empty_value_display = '-empty-'
+
+
+@admin.register(ShortLink)
+class ShortLinkAdmin(admin.ModelAdmin):
+    list_display = ('id', 'code', 'recipe')
+    search_fields = ('code',)
+    empty_value_display = '-empty-'
@@ -0,0 +1,59 @@
+import uuid
+from functools import partial
+
+from django.core.cache import cache
+from django.db import transaction
+
+VERSION_KEY = 'version:{}'
+RECIPES_DELETED_AT_KEY = 'recipes:deleted_at'
+
+
+def new_version():
+    # Never reuse a value: an evicted version key must not bring back
+    # entries that were stored under an old version with the same number.
+    return uuid.uuid4().hex
+
+
+def get_version(name):
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        version = new_version()
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(name):
+    version = new_version()
+    cache.set(VERSION_KEY.format(name), version, None)
+    return version
+
+
+def bump_version_on_commit(name):
+    """Bump once the current transaction commits, at once outside one.
+
+    Bumping earlier would let a concurrent reader cache the rows it still
+    sees as old under the new version.
+    """
+    transaction.on_commit(partial(bump_version, name))
+
+
+def auth_token_version_name(key):
+    return f'auth_token:{key}'
+
+
+def shopping_cart_version_name(user_id):
+    return f'shopping_cart:{user_id}'
+
+
+def user_flags_version_name(user_id):
+    return f'user_flags:{user_id}'
+
+
+def mark_recipes_deleted(moment):
+    cache.set(RECIPES_DELETED_AT_KEY, moment, None)
+
+
+def get_recipes_deleted_at():
+    return cache.get(RECIPES_DELETED_AT_KEY)
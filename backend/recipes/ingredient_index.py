@@ -0,0 +1,85 @@
+import bisect
+import re
+import threading
+import unicodedata
+
+from foodgram import constants as c
+from foodgram.replicas import primary_reads
+from recipes.cache import get_version
+from recipes.models import Ingredient
+
+WORD_START = re.compile(r'(?<=[\s\-(,])\w')
+
+EXACT, PREFIX, WORD_PREFIX = range(3)
+
+
+def fold(value):
+    return unicodedata.normalize('NFKC', value).casefold().replace('ё', 'е')
+
+
+class IngredientIndex:
+    """Sorted in-memory prefix index over the ingredient catalog.
+
+    Every ingredient is indexed by its folded name and by each word inside
+    it, so lookups are a bisect plus a scan over the matching keys. The
+    index is rebuilt lazily whenever the shared ingredients version moves.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = None
+        self.snapshot = ((), (), {})
+
+    def build(self, version):
+        ingredients = {}
+        pairs = []
+        for pk, name, unit in Ingredient.objects.values_list(
+                'id', 'name', 'measurement_unit').iterator():
+            ingredients[pk] = {
+                'id': pk,
+                'name': name,
+                'measurement_unit': unit,
+            }
+            folded = fold(name)
+            pairs.append((folded, PREFIX, folded, pk))
+            for match in WORD_START.finditer(folded):
+                pairs.append(
+                    (folded[match.start():], WORD_PREFIX, folded, pk)
+                )
+        pairs.sort()
+        # Published in one assignment, so searches never mix two builds.
+        self.snapshot = (
+            tuple(pair[0] for pair in pairs),
+            tuple(pair[1:] for pair in pairs),
+            ingredients,
+        )
+        self.version = version
+
+    def refresh(self):
+        version = get_version(c.INGREDIENTS_VERSION)
+        if self.version == version:
+            return
+        with self.lock, primary_reads():
+            if self.version != version:
+                self.build(version)
+
+    def search(self, query, limit=c.INGREDIENT_SEARCH_LIMIT):
+        self.refresh()
+        keys, entries, ingredients = self.snapshot
+        query = fold(query.strip())
+        matches = {}
+        for position in range(bisect.bisect_left(keys, query), len(keys)):
+            if not keys[position].startswith(query):
+                break
+            rank, folded, pk = entries[position]
+            if folded == query:
+                rank = EXACT
+            if pk not in matches or rank < matches[pk][0]:
+                matches[pk] = (rank, len(folded), folded, pk)
+        return [
+            ingredients[match[-1]]
+            for match in sorted(matches.values())[:limit]
+        ]
+
+
+ingredient_index = IngredientIndex()
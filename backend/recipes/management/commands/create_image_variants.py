@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from foodgram import constants as c
+from foodgram.images import create_variants
+from recipes.models import Recipe
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = 'Create resized variants for existing recipe images and avatars'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--overwrite',
+            action='store_true',
+            help='Re-encode variants that already exist',
+        )
+
+    def handle(self, *args, **options):
+        sources = (
+            (Recipe.objects.exclude(image=''), 'image',
+             c.RECIPE_IMAGE_VARIANTS),
+            (User.objects.exclude(avatar='').exclude(avatar=None), 'avatar',
+             c.AVATAR_VARIANTS),
+        )
+        for queryset, field, variants in sources:
+            count = 0
+            fields = ('pk', field, f'{field}_variants_of')
+            for instance in queryset.only(*fields).iterator():
+                create_variants(
+                    getattr(instance, field), variants, options['overwrite']
+                )
+                count += 1
+            self.stdout.write(self.style.SUCCESS(
+                f'{count} {queryset.model._meta.verbose_name_plural} '
+                f'processed ({field}).'
+            ))
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from foodgram import constants as c
+from recipes.cache import bump_version
+from recipes.models import Recipe, ShortLink
+from recipes.short_links import generate_code
+
+
+class Command(BaseCommand):
+    help = 'Generate short link codes for recipes that do not have one'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=c.IMPORT_BATCH_SIZE,
+            help='Number of links inserted per query',
+        )
+
+    def handle(self, *args, **options):
+        missing = Recipe.objects.filter(short_link=None).order_by('id')
+        total = missing.count()
+        while True:
+            recipe_ids = list(
+                missing.values_list('id', flat=True)[:options['batch_size']]
+            )
+            if not recipe_ids:
+                break
+            # Colliding codes are skipped and picked up on the next pass.
+            ShortLink.objects.bulk_create(
+                (ShortLink(recipe_id=recipe_id, code=generate_code())
+                 for recipe_id in recipe_ids),
+                ignore_conflicts=True,
+            )
+        if total:
+            bump_version(c.SHORT_LINKS_VERSION)
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} short links created.'
+        ))
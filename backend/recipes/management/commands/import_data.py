@@ -1,40 +1,156 @@
 import csv
+import json
+import os
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
-from django.db import IntegrityError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
 
+from foodgram import constants as c
 from foodgram import settings
-from recipes.models import Ingredient
+from recipes.cache import bump_version
+from recipes.models import Ingredient, Recipe
+
+CSV_HEADER = ['name', 'measurement_unit']
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if row and row != CSV_HEADER:
+            yield row[0], row[1]
+
+
+def read_json(file, chunk_size=64 * 1024):
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    while True:
+        chunk = file.read(chunk_size)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and buffer[position:position + 1] == '[':
+                started = True
+                position += 1
+                continue
+            if buffer[position:position + 1] == ']':
+                return
+            try:
+                item, position = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break
+            yield item['name'], item['measurement_unit']
+        if not chunk:
+            return
+
+
+READERS = {
+    '.csv': read_csv,
+    '.json': read_json,
+}
 
 
 class Command(BaseCommand):
-    help = 'Import data from csv file into Ingredient model in database'
+    help = 'Import ingredients from a csv or json file into the database'
 
     def add_arguments(self, parser):
-        parser.add_argument('--path', type=str, help='Path to file')
+        parser.add_argument(
+            '--path',
+            type=str,
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'),
+            help='Path to file',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=c.IMPORT_BATCH_SIZE,
+            help='Number of rows written per query',
+        )
+        parser.add_argument(
+            '--update',
+            action='store_true',
+            help='Update measurement units of already existing ingredients',
+        )
 
     def handle(self, *args, **options):
-        success_count = 0
-        print('Loading data...')
-        with open(
-                f'{settings.BASE_DIR}/data/ingredients.csv',
-                'r',
-                encoding='utf-8',
-        ) as csv_file:
-            reader = csv.reader(csv_file)
-
-            for row in reader:
-                name_csv = 0
-                unit_csv = 1
-                try:
-                    obj, created = Ingredient.objects.get_or_create(
-                        name=row[name_csv],
-                        measurement_unit=row[unit_csv],
-                    )
-                    if created:
-                        success_count += 1
-                    if not created:
-                        print(f'Ingredient {obj} already exists in database')
-                except IntegrityError as err:
-                    print(f'Error in row {row}: {err}')
-        print(f'{success_count} entries were imported from .csv file.')
+        path = options['path']
+        reader = READERS.get(os.path.splitext(path)[1].lower())
+        if reader is None:
+            raise CommandError(
+                f'Unsupported file type: {path}. '
+                f'Use one of: {", ".join(READERS)}'
+            )
+        self.stdout.write(f'Loading data from {path}...')
+        self.counts = {'inserted': 0, 'updated': 0, 'skipped': 0}
+        started = time.monotonic()
+        try:
+            with open(path, encoding='utf-8') as file, transaction.atomic():
+                rows = self.unique_rows(reader(file))
+                while batch := list(islice(rows, options['batch_size'])):
+                    self.import_batch(batch, options['update'])
+        except (OSError, KeyError, IndexError, ValueError) as err:
+            raise CommandError(f'Could not import {path}: {err!r}')
+        if self.counts['inserted'] or self.counts['updated']:
+            bump_version(c.INGREDIENTS_VERSION)
+            bump_version(c.RECIPE_INGREDIENTS_VERSION)
+        if self.counts['updated']:
+            # Recipes listing the updated ingredients were touched.
+            bump_version(c.RECIPE_CATALOG_VERSION)
+        elapsed = time.monotonic() - started
+        total = sum(self.counts.values())
+        self.stdout.write(self.style.SUCCESS(
+            '{inserted} inserted, {updated} updated, {skipped} skipped'.format(
+                **self.counts
+            )
+            + f' in {elapsed:.2f}s ({total / max(elapsed, 1e-6):.0f} rows/s).'
+        ))
+
+    def unique_rows(self, rows):
+        seen = set()
+        for name, unit in rows:
+            name, unit = name.strip(), unit.strip()
+            if not name or name in seen:
+                self.counts['skipped'] += 1
+                continue
+            seen.add(name)
+            yield name, unit
+
+    def import_batch(self, batch, update):
+        existing = dict(
+            Ingredient.objects.filter(
+                name__in=[name for name, _ in batch]
+            ).values_list('name', 'measurement_unit')
+        )
+        changed = [
+            name for name, unit in batch
+            if name in existing and existing[name] != unit
+        ]
+        self.counts['inserted'] += len(batch) - len(existing)
+        if update:
+            self.counts['updated'] += len(changed)
+            self.counts['skipped'] += len(existing) - len(changed)
+            Recipe.objects.filter(ingredients__name__in=changed).update(
+                updated_at=timezone.now()
+            )
+        else:
+            self.counts['skipped'] += len(existing)
+        ingredients = [
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in batch
+        ]
+        if update:
+            Ingredient.objects.bulk_create(
+                ingredients,
+                update_conflicts=True,
+                unique_fields=('name',),
+                update_fields=('measurement_unit',),
+            )
+        else:
+            Ingredient.objects.bulk_create(ingredients, ignore_conflicts=True)
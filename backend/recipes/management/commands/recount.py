@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from foodgram import constants as c
+from recipes.cache import bump_version
+from recipes.signals import COUNTERS, touches_recipe
+
+
+class Command(BaseCommand):
+    help = ('Recalculate denormalized favorite, shopping cart, recipe and '
+            'follower counters')
+
+    def handle(self, *args, **options):
+        for sender, (model, key, field) in COUNTERS.items():
+            actual = Coalesce(Subquery(
+                sender.objects.filter(**{key: OuterRef('pk')}).order_by()
+                .values(key).annotate(count=Count('pk')).values('count')
+            ), 0)
+            touched = touches_recipe(model, field)
+            extra = {'updated_at': timezone.now()} if touched else {}
+            with transaction.atomic():
+                repaired = model.objects.exclude(**{field: actual}).update(
+                    **{field: actual}, **extra
+                )
+            if repaired and touched:
+                bump_version(c.RECIPE_CATALOG_VERSION)
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}.{field}: '
+                f'{repaired} repaired.'
+            ))
@@ -0,0 +1,343 @@
+import io
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from foodgram import constants as c
+from foodgram.images import create_variants
+from recipes.cache import bump_version
+from recipes.models import (Favorite, Ingredient, Recipe, RecipeIngredient,
+                            RecipeTags, ShoppingList, Tag, get_tags_mask)
+from users.models import Follow, User
+
+FIRST_NAMES = ('Анна', 'Иван', 'Мария', 'Пётр', 'Ольга', 'Сергей', 'Елена',
+               'Дмитрий', 'Наталья', 'Алексей')
+LAST_NAMES = ('Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Соколов', 'Лебедев',
+              'Козлов', 'Новиков', 'Морозов', 'Волков')
+DISHES = ('суп', 'салат', 'пирог', 'рагу', 'омлет', 'плов', 'борщ',
+          'запеканка', 'паста', 'каша', 'котлеты', 'блины')
+STYLES = ('домашний', 'быстрый', 'летний', 'острый', 'сытный', 'лёгкий',
+          'праздничный', 'овощной', 'бабушкин', 'пряный')
+WORDS = ('нарезать', 'обжарить', 'добавить', 'посолить', 'перемешать',
+         'варить', 'запекать', 'минут', 'до', 'готовности', 'на', 'среднем',
+         'огне', 'подавать', 'горячим', 'с', 'зеленью', 'и', 'сметаной')
+IMAGE_COLORS = ('#e4572e', '#29335c', '#f3a712', '#a8c686', '#669bbc',
+                '#b56576', '#6d597a', '#eaac8b', '#355070', '#90be6d',
+                '#f9c74f', '#577590')
+TAGS = (('Завтрак', 'breakfast'), ('Обед', 'lunch'), ('Ужин', 'dinner'),
+        ('Десерт', 'dessert'), ('Выпечка', 'baking'), ('Веган', 'vegan'))
+
+
+def copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return (
+        str(value).replace('\\', '\\\\').replace('\t', '\\t')
+        .replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+def split(total, parts, number):
+    """Size of the ``number``-th of ``parts`` near-equal shares of total."""
+    return total // parts + (number < total % parts)
+
+
+class TableWriter:
+    """Buffers unsaved instances and writes them with COPY or bulk_create.
+
+    Primary keys are assigned by the caller, so related rows can be
+    generated without reading anything back from the database. Writers of
+    the referenced tables are flushed first to keep foreign keys valid.
+    """
+
+    def __init__(self, model, batch_size, use_copy, parents=()):
+        self.model = model
+        self.parents = parents
+        self.batch_size = batch_size
+        self.use_copy = use_copy
+        self.fields = model._meta.concrete_fields
+        self.buffer = []
+        self.count = 0
+        self.elapsed = 0
+
+    def add(self, instance):
+        self.buffer.append(instance)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.buffer:
+            return
+        for parent in self.parents:
+            parent.flush()
+        started = time.perf_counter()
+        if self.use_copy:
+            self.copy(self.buffer)
+        else:
+            self.model.objects.bulk_create(self.buffer)
+        self.elapsed += time.perf_counter() - started
+        self.count += len(self.buffer)
+        self.buffer = []
+
+    def copy(self, instances):
+        data = io.StringIO()
+        for instance in instances:
+            data.write('\t'.join(
+                copy_value(field.get_db_prep_save(
+                    field.pre_save(instance, True), connection
+                ))
+                for field in self.fields
+            ))
+            data.write('\n')
+        data.seek(0)
+        quote = connection.ops.quote_name
+        columns = ', '.join(quote(field.column) for field in self.fields)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f'COPY {quote(self.model._meta.db_table)} ({columns}) '
+                'FROM STDIN',
+                data,
+            )
+
+
+class Command(BaseCommand):
+    help = ('Generate a deterministic synthetic dataset of users, recipes, '
+            'follows, favorites and shopping carts')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=c.SEED_USERS,
+            help='Number of users to create',
+        )
+        parser.add_argument(
+            '--recipes',
+            type=int,
+            default=c.SEED_RECIPES,
+            help='Number of recipes to create',
+        )
+        parser.add_argument(
+            '--follows',
+            type=int,
+            default=c.SEED_FOLLOWS,
+            help='Total number of subscriptions to create',
+        )
+        parser.add_argument(
+            '--favorites',
+            type=int,
+            default=c.SEED_FAVORITES,
+            help='Total number of favorites to create',
+        )
+        parser.add_argument(
+            '--carts',
+            type=int,
+            default=c.SEED_CARTS,
+            help='Total number of shopping cart entries to create',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed; the same seed gives the same dataset',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=c.SEED_BATCH_SIZE,
+            help='Number of rows written per query',
+        )
+        parser.add_argument(
+            '--no-copy',
+            action='store_true',
+            help='Use bulk_create even on PostgreSQL',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 2 or options['recipes'] < 1:
+            raise CommandError('At least 2 users and 1 recipe are required.')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.use_copy = (
+            connection.vendor == 'postgresql' and not options['no_copy']
+        )
+        self.writers = []
+        started = time.perf_counter()
+
+        tags = self.get_tags()
+        ingredient_ids = self.get_ingredient_ids()
+        images = self.get_images()
+        user_ids = self.create_users(options['users'])
+        recipe_ids = self.create_recipes(
+            options['recipes'], user_ids, tags, ingredient_ids, images
+        )
+        self.create_pairs(Follow, 'author_id', options['follows'],
+                          user_ids, user_ids)
+        self.create_pairs(Favorite, 'recipe_id', options['favorites'],
+                          user_ids, recipe_ids)
+        self.create_pairs(ShoppingList, 'recipe_id', options['carts'],
+                          user_ids, recipe_ids)
+        self.finish()
+
+        elapsed = time.perf_counter() - started
+        total = sum(writer.count for writer in self.writers)
+        for writer in self.writers:
+            self.stdout.write(
+                f'{writer.model._meta.verbose_name_plural}: '
+                f'{writer.count} rows, '
+                f'{writer.count / max(writer.elapsed, 1e-9):.0f} rows/s'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} rows in {elapsed:.1f}s '
+            f'({total / max(elapsed, 1e-9):.0f} rows/s, '
+            f'{"COPY" if self.use_copy else "bulk_create"}).'
+        ))
+
+    def get_writer(self, model, parents=()):
+        writer = TableWriter(model, self.batch_size, self.use_copy, parents)
+        self.writers.append(writer)
+        return writer
+
+    def get_next_id(self, model):
+        return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    def get_tags(self):
+        if not Tag.objects.exists():
+            for name, slug in TAGS:
+                Tag.objects.create(name=name, slug=slug)
+        return list(Tag.objects.order_by('id'))
+
+    def get_ingredient_ids(self):
+        if not Ingredient.objects.exists():
+            Ingredient.objects.bulk_create(
+                Ingredient(name=f'ingredient {number}', measurement_unit='г')
+                for number in range(c.SEED_INGREDIENTS)
+            )
+            bump_version(c.INGREDIENTS_VERSION)
+        return list(
+            Ingredient.objects.order_by('id').values_list('id', flat=True)
+        )
+
+    def get_images(self):
+        names = []
+        for number, color in enumerate(IMAGE_COLORS):
+            name = f'media/recipes/seed-{number}.jpg'
+            if not default_storage.exists(name):
+                buffer = io.BytesIO()
+                Image.new('RGB', (1200, 800), color).save(buffer, 'JPEG')
+                name = default_storage.save(
+                    name, ContentFile(buffer.getvalue())
+                )
+            create_variants(Recipe(image=name).image, c.RECIPE_IMAGE_VARIANTS)
+            names.append(name)
+        return names
+
+    def create_users(self, count):
+        rng = self.rng
+        writer = self.get_writer(User)
+        password = make_password(None)
+        first_id = self.get_next_id(User)
+        now = timezone.now()
+        for pk in range(first_id, first_id + count):
+            writer.add(User(
+                pk=pk,
+                username=f'user{pk}',
+                email=f'user{pk}@example.com',
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+                password=password,
+                date_joined=now,
+            ))
+        writer.flush()
+        return range(first_id, first_id + count)
+
+    def create_recipes(self, count, user_ids, tags, ingredient_ids, images):
+        rng = self.rng
+        recipes = self.get_writer(Recipe)
+        recipe_tags = self.get_writer(RecipeTags, (recipes,))
+        recipe_ingredients = self.get_writer(RecipeIngredient, (recipes,))
+        first_id = self.get_next_id(Recipe)
+        tag_row_id = self.get_next_id(RecipeTags)
+        ingredient_row_id = self.get_next_id(RecipeIngredient)
+        for pk in range(first_id, first_id + count):
+            selected_tags = rng.sample(
+                tags, min(rng.randint(1, c.SEED_TAGS_PER_RECIPE), len(tags))
+            )
+            image = rng.choice(images)
+            recipes.add(Recipe(
+                pk=pk,
+                name=f'{rng.choice(STYLES).capitalize()} '
+                     f'{rng.choice(DISHES)} №{pk}',
+                text=' '.join(rng.choices(WORDS, k=rng.randint(10, 60))),
+                cooking_time=rng.randint(5, 180),
+                image=image,
+                image_variants_of=image,
+                author_id=rng.choice(user_ids),
+                tags_mask=get_tags_mask(selected_tags),
+            ))
+            for tag in selected_tags:
+                recipe_tags.add(
+                    RecipeTags(pk=tag_row_id, recipe_id=pk, tag_id=tag.pk)
+                )
+                tag_row_id += 1
+            for ingredient_id in rng.sample(
+                    ingredient_ids,
+                    min(rng.randint(*c.SEED_INGREDIENTS_PER_RECIPE),
+                        len(ingredient_ids))):
+                recipe_ingredients.add(RecipeIngredient(
+                    pk=ingredient_row_id,
+                    recipe_id=pk,
+                    ingredient_id=ingredient_id,
+                    amount=rng.randint(1, 500),
+                ))
+                ingredient_row_id += 1
+        for writer in (recipes, recipe_tags, recipe_ingredients):
+            writer.flush()
+        return range(first_id, first_id + count)
+
+    def create_pairs(self, model, target, total, user_ids, target_ids):
+        """Give every user an equal share of ``total`` distinct targets."""
+        rng = self.rng
+        writer = self.get_writer(model)
+        pk = self.get_next_id(model)
+        for number, user_id in enumerate(user_ids):
+            share = split(total, len(user_ids), number)
+            # One spare candidate replaces the user when following oneself.
+            candidates = [
+                target_id
+                for target_id in rng.sample(
+                    target_ids, min(share + 1, len(target_ids))
+                )
+                if model is not Follow or target_id != user_id
+            ]
+            for target_id in candidates[:share]:
+                writer.add(
+                    model(pk=pk, user_id=user_id, **{target: target_id})
+                )
+                pk += 1
+        writer.flush()
+
+    def finish(self):
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(
+                    no_style(),
+                    [writer.model for writer in self.writers]):
+                cursor.execute(sql)
+        if connection.vendor == 'postgresql':
+            Recipe.objects.update_search_vector()
+        call_command('recount', stdout=io.StringIO())
+        for name in (c.RECIPE_INGREDIENTS_VERSION, c.TAGS_VERSION,
+                     c.RECIPE_CATALOG_VERSION):
+            bump_version(name)
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.10 on 2026-10-18 06:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+COUNTERS = (
+    ('recipes', 'Favorite', 'recipes', 'Recipe', 'recipe_id',
+     'favorites_count'),
+    ('recipes', 'ShoppingList', 'recipes', 'Recipe', 'recipe_id',
+     'in_carts_count'),
+    ('recipes', 'Recipe', 'users', 'User', 'author_id', 'recipes_count'),
+    ('users', 'Follow', 'users', 'User', 'author_id', 'followers_count'),
+)
+
+
+def fill_counters(apps, schema_editor):
+    for app, sender, model_app, model, key, field in COUNTERS:
+        rows = apps.get_model(app, sender).objects.filter(
+            **{key: OuterRef('pk')}
+        ).order_by().values(key).annotate(count=Count('pk'))
+        apps.get_model(model_app, model).objects.update(**{
+            field: Coalesce(Subquery(rows.values('count')), 0)
+        })
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_search'),
+        ('users', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Times favorited'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Times added to shopping cart'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
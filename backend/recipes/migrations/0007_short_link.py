@@ -0,0 +1,26 @@
+# Generated by Django 5.1.10 on 2026-10-18 06:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_tag_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShortLink',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=100, unique=True, verbose_name='Short link code')),
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='short_link', to='recipes.recipe', verbose_name='Recipe')),
+            ],
+            options={
+                'verbose_name': 'Short link',
+                'verbose_name_plural': 'Short links',
+            },
+        ),
+    ]
@@ -1,3 +1,5 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
 
@@ -50,6 +52,12 @@ class Tag(models.Model):
         verbose_name='Tag slug',
         help_text='Tag slug',
     )
+    bit = models.PositiveSmallIntegerField(
+        unique=True,
+        null=True,
+        editable=False,
+        verbose_name='Bit in recipe tag masks',
+    )
 
     class Meta:
         verbose_name = 'Tag'
@@ -58,6 +66,58 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+    @property
+    def mask(self):
+        return 0 if self.bit is None else 1 << self.bit
+
+
+def get_tags_mask(tags):
+    mask = 0
+    for tag in tags:
+        mask |= tag.mask
+    return mask
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            models.Prefetch('tags', queryset=Tag.objects.order_by('id')),
+            models.Prefetch(
+                'ingredient_list',
+                queryset=RecipeIngredient.objects.select_related('ingredient'),
+            ),
+        )
+
+    def with_user_flags(self, user):
+        if not user.is_authenticated:
+            return self
+        return self.annotate(
+            is_favorited=models.Exists(
+                Favorite.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+            is_in_shopping_cart=models.Exists(
+                ShoppingList.objects.filter(
+                    user=user, recipe=models.OuterRef('pk')
+                )
+            ),
+        )
+
+    def update_search_vector(self):
+        return self.update(search_vector=(
+            SearchVector('name', weight='A', config=c.SEARCH_CONFIG)
+            + SearchVector('text', weight='B', config=c.SEARCH_CONFIG)
+        ))
+
+    def update_tags_mask(self):
+        self.update(tags_mask=0)
+        for tag in Tag.objects.exclude(bit=None):
+            self.filter(tags=tag).update(
+                tags_mask=models.F('tags_mask').bitor(tag.mask)
+            )
+
 
 class Recipe(models.Model):
     name = models.CharField(
@@ -91,6 +151,12 @@ class Recipe(models.Model):
         help_text='Recipe image',
         upload_to='media/recipes/',
     )
+    image_variants_of = models.CharField(
+        max_length=c.IMAGE_NAME_MAX_LENGTH,
+        blank=True,
+        editable=False,
+        verbose_name='Image with created variants',
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -105,11 +171,49 @@ class Recipe(models.Model):
         verbose_name='Recipe tags',
         help_text='Recipe tags',
     )
+    tags_mask = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Tag bitmask',
+    )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name='Last modified',
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Full-text search vector',
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Times favorited',
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Times added to shopping cart',
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-id',)
         verbose_name = 'Recipe'
         verbose_name_plural = 'Recipes'
+        indexes = (
+            GinIndex(
+                fields=('search_vector',),
+                name='recipe_search_vector_idx',
+            ),
+            GinIndex(
+                fields=('name',),
+                name='recipe_name_trgm_idx',
+                opclasses=('gin_trgm_ops',),
+            ),
+        )
 
     def __str__(self):
         return self.name
@@ -233,3 +337,24 @@ class ShoppingList(models.Model):
         return (
             f'Recipe {self.recipe} is in shopping list of user {self.user}'
         )
+
+
+class ShortLink(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='short_link',
+        verbose_name='Recipe',
+    )
+    code = models.CharField(
+        max_length=c.SHORT_URL_MAX_LENGTH,
+        unique=True,
+        verbose_name='Short link code',
+    )
+
+    class Meta:
+        verbose_name = 'Short link'
+        verbose_name_plural = 'Short links'
+
+    def __str__(self):
+        return f'{self.code} -> {self.recipe}'
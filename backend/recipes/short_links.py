@@ -0,0 +1,89 @@
+import secrets
+import string
+import threading
+from collections import OrderedDict
+
+from django.db import IntegrityError, transaction
+
+from foodgram import constants as c
+from foodgram.replicas import primary_reads
+from recipes.cache import get_version
+from recipes.models import Recipe, ShortLink
+
+ALPHABET = string.digits + string.ascii_letters
+
+
+def generate_code(length=c.SHORT_LINK_CODE_LENGTH):
+    # Starts with a letter: all-digit codes are read as legacy recipe ids.
+    return secrets.choice(string.ascii_letters) + ''.join(
+        secrets.choice(ALPHABET) for _ in range(length - 1)
+    )
+
+
+def get_short_link(recipe):
+    """Existing link of the recipe or a new one with a random code.
+
+    A concurrent request for the same recipe is resolved by
+    ``get_or_create`` itself, so only code collisions are retried.
+    """
+    for attempt in range(1, c.SHORT_LINK_CREATE_ATTEMPTS + 1):
+        code = generate_code()
+        try:
+            with transaction.atomic():
+                link, _ = ShortLink.objects.get_or_create(
+                    recipe=recipe, defaults={'code': code}
+                )
+            return link
+        except IntegrityError:
+            if (attempt == c.SHORT_LINK_CREATE_ATTEMPTS
+                    or not ShortLink.objects.filter(code=code).exists()):
+                raise
+
+
+class ShortLinkCache:
+    """Per-process LRU from short link codes to recipe ids.
+
+    Misses are cached as ``None`` so unknown codes do not hit the database
+    either. The whole cache is dropped whenever the shared short links
+    version moves, which happens when links are edited or deleted and when
+    recipes are deleted. Creating a link does not move it: the new code is
+    random and was never handed out, so no miss is cached for it.
+    """
+
+    def __init__(self, maxsize=c.SHORT_LINK_CACHE_SIZE):
+        self.lock = threading.Lock()
+        self.maxsize = maxsize
+        self.version = None
+        self.entries = OrderedDict()
+
+    def lookup(self, code):
+        recipe_id = ShortLink.objects.filter(code=code).values_list(
+            'recipe_id', flat=True
+        ).first()
+        if recipe_id is None and code.isdigit():
+            # Links handed out before codes existed were /s/<recipe id>/.
+            recipe_id = Recipe.objects.filter(pk=int(code)).values_list(
+                'id', flat=True
+            ).first()
+        return recipe_id
+
+    def resolve(self, code):
+        version = get_version(c.SHORT_LINKS_VERSION)
+        with self.lock:
+            if self.version != version:
+                self.entries.clear()
+                self.version = version
+            elif code in self.entries:
+                self.entries.move_to_end(code)
+                return self.entries[code]
+        with primary_reads():
+            recipe_id = self.lookup(code)
+        with self.lock:
+            if self.version == version:
+                self.entries[code] = recipe_id
+                if len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+        return recipe_id
+
+
+short_link_cache = ShortLinkCache()
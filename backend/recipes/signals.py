@@ -0,0 +1,202 @@
+from django.db import connections, transaction
+from django.db.models import F
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from foodgram import constants as c
+from foodgram.images import (create_model_variants, has_variants,
+                             variants_created)
+from jobs.queue import enqueue
+from recipes.cache import (bump_version_on_commit, mark_recipes_deleted,
+                           shopping_cart_version_name, user_flags_version_name)
+from recipes.models import (Favorite, Ingredient, Recipe, ShoppingList,
+                            ShortLink, Tag)
+from users.models import Follow, User
+
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name', 'avatar'}
+COUNTERS = {
+    Favorite: (Recipe, 'recipe_id', 'favorites_count'),
+    ShoppingList: (Recipe, 'recipe_id', 'in_carts_count'),
+    Recipe: (User, 'author_id', 'recipes_count'),
+    Follow: (User, 'author_id', 'followers_count'),
+}
+# Recipe counters that are part of the API representation. Changing one
+# touches the recipe; in_carts_count is internal and does not.
+VISIBLE_COUNTERS = {'favorites_count'}
+
+
+def touches_recipe(model, field):
+    return model is Recipe and field in VISIBLE_COUNTERS
+
+
+def touch_recipes(**lookups):
+    Recipe.objects.filter(**lookups).update(updated_at=timezone.now())
+    bump_version_on_commit(c.RECIPE_CATALOG_VERSION)
+
+
+def deleted_with(origin, model, pk):
+    """Whether the row holding the counter is the one being deleted.
+
+    Only the instance passed to ``delete()`` is checked, rows cascaded
+    from a queryset delete still update their counters.
+    """
+    return isinstance(origin, model) and origin.pk == pk
+
+
+def change_counter(model, pk, field, delta):
+    queryset = model.objects.filter(pk=pk)
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    # Moving updated_at refreshes the fragment and the ETag of the recipe.
+    # The catalog version is left alone, a toggle must not evict every
+    # cached page, so anonymous pages show counters RECIPE_PAGE_CACHE_TIMEOUT
+    # old at most.
+    extra = (
+        {'updated_at': timezone.now()} if touches_recipe(model, field) else {}
+    )
+    queryset.update(**{field: F(field) + delta}, **extra)
+
+
+@receiver((post_save, post_delete), sender=ShoppingList)
+def shopping_list_changed(sender, instance, **kwargs):
+    bump_version_on_commit(shopping_cart_version_name(instance.user_id))
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def recipe_ingredients_changed(sender, **kwargs):
+    bump_version_on_commit(c.RECIPE_INGREDIENTS_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(sender, **kwargs):
+    bump_version_on_commit(c.INGREDIENTS_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tags_changed(sender, **kwargs):
+    bump_version_on_commit(c.TAGS_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver(post_delete, sender=Tag)
+def recipe_catalog_changed(sender, **kwargs):
+    bump_version_on_commit(c.RECIPE_CATALOG_VERSION)
+
+
+@receiver((post_save, post_delete), sender=Favorite)
+@receiver((post_save, post_delete), sender=ShoppingList)
+@receiver((post_save, post_delete), sender=Follow)
+def user_flags_changed(sender, instance, **kwargs):
+    bump_version_on_commit(user_flags_version_name(instance.user_id))
+
+
+@receiver((post_save, post_delete), sender=ShortLink)
+@receiver(post_delete, sender=Recipe)
+def short_links_changed(sender, created=False, **kwargs):
+    if not created:
+        bump_version_on_commit(c.SHORT_LINKS_VERSION)
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(sender, **kwargs):
+    transaction.on_commit(lambda: mark_recipes_deleted(timezone.now()))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(ingredients=instance)
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_deleted(sender, instance, **kwargs):
+    touch_recipes(ingredients=instance)
+
+
+@receiver(pre_save, sender=Tag)
+def tag_bit_assigned(sender, instance, **kwargs):
+    if not instance._state.adding or instance.bit is not None:
+        return
+    used = set(Tag.objects.exclude(bit=None).values_list('bit', flat=True))
+    instance.bit = next(
+        (bit for bit in range(c.TAG_MASK_BITS) if bit not in used), None
+    )
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    if instance.bit is not None:
+        Recipe.objects.filter(tags=instance).update(
+            tags_mask=F('tags_mask').bitand(~instance.mask),
+            updated_at=timezone.now(),
+        )
+    else:
+        touch_recipes(tags=instance)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    if not created:
+        touch_recipes(tags=instance)
+
+
+@receiver(post_save, sender=User)
+def author_saved(sender, instance, created, update_fields=None, **kwargs):
+    if created or (update_fields and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    touch_recipes(author=instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_image_saved(sender, instance, **kwargs):
+    if instance.image and not has_variants(instance.image):
+        enqueue(
+            create_model_variants,
+            'recipes.Recipe',
+            instance.pk,
+            'image',
+            c.RECIPE_IMAGE_VARIANTS,
+            unique=True,
+        )
+
+
+@receiver(variants_created, sender=Recipe)
+def recipe_variants_created(sender, instance, **kwargs):
+    # Variant urls are only listed once the files exist.
+    touch_recipes(pk=instance.pk)
+
+
+@receiver(variants_created, sender=User)
+def avatar_variants_created(sender, instance, **kwargs):
+    touch_recipes(author=instance)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_search_vector_saved(sender, instance, **kwargs):
+    if connections[instance._state.db].vendor == 'postgresql':
+        Recipe.objects.using(instance._state.db).filter(
+            pk=instance.pk
+        ).update_search_vector()
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingList)
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Follow)
+def counted_object_saved(sender, instance, created, **kwargs):
+    if created:
+        model, key, field = COUNTERS[sender]
+        change_counter(model, getattr(instance, key), field, 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingList)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Follow)
+def counted_object_deleted(sender, instance, origin=None, **kwargs):
+    model, key, field = COUNTERS[sender]
+    pk = getattr(instance, key)
+    if not deleted_with(origin, model, pk):
+        change_counter(model, pk, field, -1)
@@ -12,6 +12,8 @@ class UserAdmin(UserAdmin):
         'email',
         'first_name',
         'last_name',
+        'recipes_count',
+        'followers_count',
     )
     list_filter = ('email', 'first_name')
     empty_value_display = '-empty-'
@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+from foodgram import constants as c
+from foodgram.replicas import primary_reads
+from recipes.cache import (auth_token_version_name, bump_version_on_commit,
+                           get_version)
+from users.models import User
+
+TOKEN_KEY = 'auth_token:{}:{}'
+# Cached field values of the token owner. The password hash never leaves
+# the database and is loaded on demand like any deferred field.
+USER_FIELDS = tuple(
+    field.attname for field in User._meta.concrete_fields
+    if field.attname != 'password'
+)
+
+
+class TokenUserCache:
+    """Token key to active user, kept per process and in the shared cache.
+
+    Entries are the field values of the user, without the password, and
+    live for ``AUTH_TOKEN_CACHE_TIMEOUT`` seconds at most under the shared
+    version of their token. Every request gets a user built from them.
+    The version moves on logout and on any change of the user that owns
+    the token, so a revoked token stops working at once in every worker
+    while the tokens of other users stay cached.
+    """
+
+    def __init__(self, maxsize=c.AUTH_TOKEN_CACHE_SIZE):
+        self.lock = threading.Lock()
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+
+    def lookup(self, key, version):
+        shared_key = TOKEN_KEY.format(key, version)
+        values = cache.get(shared_key)
+        if values is None:
+            # A lagging replica could bring back a token just deleted.
+            with primary_reads():
+                values = Token.objects.filter(
+                    key=key, user__is_active=True
+                ).values_list(
+                    *(f'user__{name}' for name in USER_FIELDS)
+                ).first()
+            if values is None:
+                return None
+            cache.set(shared_key, values, c.AUTH_TOKEN_CACHE_TIMEOUT)
+        return values
+
+    def get_user(self, key):
+        # Read before the lookup, so a concurrent change leaves the entry
+        # under a version that is already outdated.
+        version = get_version(auth_token_version_name(key))
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                values, entry_version, expires = entry
+                if entry_version == version and expires > now:
+                    self.entries.move_to_end(key)
+                    return self.build_user(values)
+                del self.entries[key]
+        values = self.lookup(key, version)
+        if values is None:
+            return None
+        with self.lock:
+            self.entries[key] = (
+                values, version, now + c.AUTH_TOKEN_CACHE_TIMEOUT
+            )
+            self.entries.move_to_end(key)
+            if len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+        return self.build_user(values)
+
+    @staticmethod
+    def build_user(values):
+        # A new instance per request, views may modify request.user.
+        return User.from_db(DEFAULT_DB_ALIAS, USER_FIELDS, values)
+
+    def invalidate(self, keys):
+        for key in keys:
+            bump_version_on_commit(auth_token_version_name(key))
+
+
+token_user_cache = TokenUserCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` that skips the token query on cache hits."""
+
+    def authenticate_credentials(self, key):
+        user = token_user_cache.get_user(key)
+        if user is None:
+            # Let DRF produce the usual error for unknown or inactive users.
+            return super().authenticate_credentials(key)
+        return (user, Token(key=key, user=user))
+
+
+def invalidate_user_tokens(user_id):
+    keys = list(
+        Token.objects.filter(user_id=user_id).values_list('key', flat=True)
+    )
+    if keys:
+        token_user_cache.invalidate(keys)
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.10 on 2026-10-18 07:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_variants_of',
+            field=models.CharField(blank=True, editable=False, max_length=100, verbose_name='Avatar with created variants'),
+        ),
+    ]
@@ -39,6 +39,22 @@ class User(AbstractUser):
         null=True,
         upload_to='media/avatars/',
     )
+    avatar_variants_of = models.CharField(
+        max_length=c.IMAGE_NAME_MAX_LENGTH,
+        blank=True,
+        editable=False,
+        verbose_name='Avatar with created variants',
+    )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Recipes',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Followers',
+    )
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = (
         'username',
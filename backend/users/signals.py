@@ -0,0 +1,40 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from foodgram import constants as c
+from foodgram.images import create_model_variants, has_variants
+from jobs.queue import enqueue
+from users.authentication import invalidate_user_tokens, token_user_cache
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+def avatar_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'avatar' not in update_fields:
+        return
+    if instance.avatar and not has_variants(instance.avatar):
+        enqueue(
+            create_model_variants,
+            'users.User',
+            instance.pk,
+            'avatar',
+            c.AVATAR_VARIANTS,
+            unique=True,
+        )
+
+
+@receiver(post_save, sender=User)
+def user_tokens_saved(sender, instance, created, update_fields=None,
+                      **kwargs):
+    # Covers password changes and deactivation as well as profile edits,
+    # but not the last_login update made by every token login.
+    if created or (update_fields is not None
+                   and set(update_fields) <= {'last_login'}):
+        return
+    invalidate_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    token_user_cache.invalidate([instance.key])